@@ -0,0 +1,99 @@
+"""Counts and cross-tabulations of policies over the dimensions of Requests, computed locally."""
+
+import pandas as pd
+
+from cpdb_api.schema import MULTI_VALUED_COLUMNS, YEAR_COLUMNS
+from cpdb_api.snapshot import Snapshot
+
+# The fields that can be filtered on with the setters of Request, and aggregated over.
+DIMENSIONS = ("country_iso", "decision_date", "policy_status", "sector", "policy_instrument", "policy_type")
+
+
+class Aggregation:
+    """
+    Counts the policies of a DataFrame, e.g. the result of an unfiltered Request.issue, per combination of values of
+    any DIMENSIONS, in a single pass instead of one filtered request per combination. A policy with several sectors,
+    instruments or types is counted once for each of its values. The multi-valued columns are split once, the first
+    time they are aggregated over.
+    """
+
+    def __init__(self, df):
+        """
+        :param df: a DataFrame of policies, with the column names used by the API
+        """
+        self._data_frame = df.reset_index(drop=True)
+        self._snapshot = None
+        self._values = dict()
+
+    def values(self, dimension):
+        """
+        :param dimension: the name of a column
+        :return: a Series of the values of the column, indexed by the position of their policy, with one entry per
+        value of multi-valued columns. Policies without a value are left out.
+        """
+        if dimension not in self._values:
+            if dimension not in self._data_frame.columns:
+                raise ValueError("the data has no column %r" % dimension)
+            column = self._data_frame[dimension]
+            if dimension in MULTI_VALUED_COLUMNS:
+                values = _split(column)
+            elif dimension in YEAR_COLUMNS:
+                values = pd.to_numeric(column, errors="coerce").astype("Int16").dropna()
+            else:
+                values = column.dropna()
+            self._values[dimension] = values.rename(dimension)
+        return self._values[dimension]
+
+    def frame(self, dimensions, properties=None):
+        """
+        :param dimensions: a list of column names
+        :param properties: the marshalled properties of a Request restricting the policies, or None for all
+        :return: a DataFrame with one row per policy and combination of its values of dimensions, indexed by the
+        position of the policy
+        """
+        dimensions = _as_list(dimensions)
+        if len(dimensions) == 0:
+            raise ValueError("at least one dimension is required")
+        df = self.values(dimensions[0]).to_frame()
+        for dimension in dimensions[1:]:
+            df = df.merge(self.values(dimension), left_index=True, right_index=True)
+        if properties:
+            if self._snapshot is None:
+                self._snapshot = Snapshot(self._data_frame)
+            mask = self._snapshot.mask(properties)
+            df = df[mask.reindex(df.index).to_numpy()]
+        return df
+
+    def counts(self, dimensions, properties=None):
+        """
+        :param dimensions: a column name or a list of those
+        :param properties: the marshalled properties of a Request restricting the policies counted, or None for all
+        :return: a Series of the number of policies per combination of values of dimensions, named "policies"
+        """
+        dimensions = _as_list(dimensions)
+        return self.frame(dimensions, properties).groupby(dimensions, observed=True).size().rename("policies")
+
+    def pivot(self, index, columns, properties=None):
+        """
+        Cross-tabulates the number of policies, e.g. pivot(["country_iso", "sector"], "decision_date") for a table of
+        country and sector rows and year columns.
+        :param index: a column name or a list of those, whose values make the rows
+        :param columns: a column name or a list of those, whose values make the columns
+        :param properties: the marshalled properties of a Request restricting the policies counted, or None for all
+        :return: a DataFrame of the number of policies, 0 for combinations without any
+        """
+        columns = _as_list(columns)
+        return self.counts(_as_list(index) + columns, properties).unstack(columns, fill_value=0)
+
+
+def _as_list(dimensions):
+    return [dimensions] if isinstance(dimensions, str) else list(dimensions)
+
+
+def _split(column):
+    # Values are comma-separated strings, as in schema.one_hot.
+    values = column.dropna().astype(str).str.split(",").explode().str.strip()
+    values = values[values != ""]
+    # A value listed twice for one policy counts once.
+    pairs = pd.DataFrame({"row": values.index, "value": values.to_numpy()})
+    return values[~pairs.duplicated().to_numpy()]
@@ -0,0 +1,23 @@
+"""Atomic replacement of files, so that readers never see a partially written file."""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def replacing(path):
+    """
+    Yields the path of a new temporary file in the directory of path. Once the body of the with statement has written
+    it, the temporary file replaces path in a single step. If the body raises, path is left untouched and the
+    temporary file is removed. Concurrent writers of the same path each get their own temporary file.
+    :param path: the file to replace
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
@@ -0,0 +1,79 @@
+"""Concurrent issuing of many Requests against the ClimatePolicy DataBase (CPDB) API."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from cpdb_api.client import Client
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class BatchResult:
+    """
+    The outcome of issuing a batch of Requests. frames holds the DataFrame of each request, or its list of policies if
+    the batch was issued with as_frame=False, in the order the requests were given, or None for the requests that
+    failed. errors maps the position of each failed request to the exception it raised.
+    """
+
+    def __init__(self, frames, errors):
+        self.frames = frames
+        self.errors = errors
+
+    def ok(self):
+        """
+        :return: True if every request of the batch succeeded
+        """
+        return len(self.errors) == 0
+
+    def concat(self, drop_duplicates=True):
+        """
+        Concatenates the DataFrames of all successful requests.
+        :param drop_duplicates: if True, policies returned by more than one request are only kept once
+        :return: a single DataFrame
+        """
+        import pandas as pd
+
+        frames = [f for f in self.frames if f is not None]
+        if len(frames) == 0:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        if drop_duplicates:
+            df = df.drop_duplicates(ignore_index=True)
+        return df
+
+
+def issue_all(reqs, max_workers=DEFAULT_MAX_WORKERS, client=None, as_frame=True):
+    """
+    Issues the given requests concurrently. A failing request does not abort the batch; its error is collected in the
+    result instead.
+
+    Requests that were not given a client with Request.set_client are issued through a shared one, so that
+    connections are reused across the batch. If client is None, a client is created for the duration of the batch.
+    :param reqs: a list of Requests
+    :param max_workers: the maximum number of requests in flight at the same time
+    :param client: the client.Client to issue the requests through
+    :param as_frame: if False, the policies of each request are kept as a list of dicts, see Request.issue
+    :return: a BatchResult
+    """
+    reqs = list(reqs)
+    owned = client is None
+    if owned:
+        client = Client(pool_size=max_workers)
+    unassigned = [r for r in reqs if r._client is None]
+    for r in unassigned:
+        r.set_client(client)
+    frames = [None] * len(reqs)
+    errors = dict()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(r.issue, as_frame=as_frame) for r in reqs]
+            for i, future in enumerate(futures):
+                try:
+                    frames[i] = future.result()
+                except Exception as e:
+                    errors[i] = e
+    finally:
+        for r in unassigned:
+            r.set_client(None)
+        if owned:
+            client.close()
+    return BatchResult(frames, errors)
@@ -0,0 +1,364 @@
+"""An opt-in, on-disk cache for responses from the ClimatePolicy DataBase (CPDB) API."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cpdb_api import atomic
+
+DEFAULT_TTL = 60 * 60  # seconds
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+
+
+class CacheEntry:
+    """
+    A single cached response body together with the validators the server sent for it.
+    """
+
+    def __init__(self, body, etag="", last_modified="", stored_at=0.0):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    def is_fresh(self, ttl):
+        """
+        :param ttl: the time to live of an entry, in seconds
+        :return: True if this entry was stored (or revalidated) less than ttl seconds ago
+        """
+        return time.time() - self.stored_at < ttl
+
+    def conditional_headers(self):
+        """
+        :return: the headers to send to revalidate this entry with a conditional GET. Empty if the server did not
+        send any validators for the cached response.
+        """
+        headers = dict()
+        if self.etag != "":
+            headers["If-None-Match"] = self.etag
+        if self.last_modified != "":
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class BaseCache:
+    """
+    The base class of the response caches. Entries are keyed on the API URL, the marshalled properties and the
+    credentials of a Request, so that users sharing a cache are never served each other's responses. They expire after
+    ttl seconds and are then revalidated with a conditional GET when the server sent an ETag or Last-Modified header.
+    Subclasses store the entries, with get, put, remove, evict, clear and fresh_properties.
+
+    The hits, misses and revalidations counters record how many requests were answered from the cache without
+    touching the network, how many needed a full download and how many were confirmed unchanged by the server
+    (HTTP 304).
+    """
+
+    def __init__(self, ttl):
+        """
+        :param ttl: the time to live of an entry, in seconds
+        """
+        self._ttl = ttl
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    @staticmethod
+    def key(api_url, properties, credentials=None):
+        """
+        :param api_url: the URL of the API the request is issued against
+        :param properties: the marshalled properties of the request, as returned by Request.marshal
+        :param credentials: the (user, password) pair the request authenticates with, or None if it does not
+        :return: the key under which the response to this request is cached. Only a digest of the credentials is
+        part of it.
+        """
+        raw = [api_url, properties]
+        if credentials is not None and credentials[0] != "":
+            raw += list(credentials)
+        return hashlib.sha256(json.dumps(raw, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def fetch(self, get, api_url, properties, credentials=None):
+        """
+        Returns the response body for a request, from the cache when a fresh entry exists and from the server
+        otherwise.
+        :param get: a callable issuing the HTTP GET, called as get(params, headers) and returning a requests.Response
+        :param api_url: the URL of the API the request is issued against
+        :param properties: the marshalled properties of the request
+        :param credentials: the (user, password) pair the request authenticates with, or None if it does not
+        :return: the body of the response, as bytes
+        """
+        key = self.key(api_url, properties, credentials)
+        entry = self.get(key)
+        if entry is not None and entry.is_fresh(self._ttl):
+            self._count("hits")
+            return entry.body
+        headers = entry.conditional_headers() if entry is not None else dict()
+        resp = get(properties, headers)
+        if resp.status_code == 304 and entry is not None:
+            self._count("revalidations")
+            self.put(key, entry.body, entry.etag, entry.last_modified, properties)
+            return entry.body
+        resp.raise_for_status()  # raise any produced error
+        self._count("misses")
+        self.put(key, resp.content, resp.headers.get("ETag", ""), resp.headers.get("Last-Modified", ""), properties)
+        return resp.content
+
+    def get(self, key):
+        """
+        :param key: the key of the entry, as returned by BaseCache.key
+        :return: the CacheEntry stored under key, or None if there is none
+        """
+        raise NotImplementedError
+
+    def put(self, key, body, etag="", last_modified="", properties=None):
+        """
+        Stores a response body, then evicts the least recently used entries if the cache is over its size bound.
+        :param key: the key of the entry, as returned by BaseCache.key
+        :param body: the response body, as bytes
+        :param etag: the ETag header sent with the response, if any
+        :param last_modified: the Last-Modified header sent with the response, if any
+        :param properties: the marshalled properties of the request, kept for inspection
+        :return: none
+        """
+        raise NotImplementedError
+
+    def fresh_properties(self, api_url, credentials=None):
+        """
+        Lists the requests to api_url with a fresh entry in this cache, e.g. to find one whose response contains the
+        answer to another request (see reuse.ResultStore).
+        :param api_url: the URL of the API
+        :param credentials: the (user, password) pair the requests authenticated with, or None if they did not
+        :return: a list of (key, properties) pairs, where properties are the marshalled properties of the request
+        """
+        raise NotImplementedError
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits within its size bound.
+        :return: none
+        """
+        raise NotImplementedError
+
+    def remove(self, key):
+        """
+        :param key: the key of the entry to remove from the cache
+        :return: none
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Removes every entry from the cache and resets the counters.
+        :return: none
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        """
+        :return: a dict with the hits, misses and revalidations counters of this cache
+        """
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, revalidations=self.revalidations)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _reset_counters(self):
+        with self._lock:
+            self.hits = self.misses = self.revalidations = 0
+
+
+class ResponseCache(BaseCache):
+    """
+    A size-bounded cache of API responses stored on disk, see BaseCache. When the cache grows beyond max_bytes, the
+    least recently used entries are evicted.
+    """
+
+    def __init__(self, directory, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(ttl)
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._index = None  # key -> (properties, stored_at) of the entries, read from disk on first use
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        """
+        :param key: the key of the entry, as returned by BaseCache.key
+        :return: the CacheEntry stored under key, or None if there is none
+        """
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(self._body_path(key), "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        # The modification time of the body file records the last access, for LRU eviction.
+        try:
+            os.utime(self._body_path(key))
+        except OSError:
+            pass  # evicted by a concurrent put since it was read; the body read is still valid
+        return CacheEntry(body, meta.get("etag", ""), meta.get("last_modified", ""), meta.get("stored_at", 0.0))
+
+    def put(self, key, body, etag="", last_modified="", properties=None):
+        """
+        Stores a response body, then evicts the least recently used entries if the cache is over its size bound.
+        :param key: the key of the entry, as returned by BaseCache.key
+        :param body: the response body, as bytes
+        :param etag: the ETag header sent with the response, if any
+        :param last_modified: the Last-Modified header sent with the response, if any
+        :param properties: the marshalled properties of the request, kept for inspection
+        :return: none
+        """
+        meta = dict(etag=etag, last_modified=last_modified, stored_at=time.time(), properties=properties)
+        self._write(self._body_path(key), body)
+        self._write(self._meta_path(key), json.dumps(meta, default=str).encode("utf-8"))
+        with self._lock:
+            if self._index is not None:
+                self._index[key] = (properties, meta["stored_at"])
+        self.evict()
+
+    def fresh_properties(self, api_url, credentials=None):
+        """
+        Lists the requests to api_url with a fresh entry in this cache, e.g. to find one whose response contains the
+        answer to another request (see reuse.ResultStore).
+        :param api_url: the URL of the API
+        :param credentials: the (user, password) pair the requests authenticated with, or None if they did not
+        :return: a list of (key, properties) pairs, where properties are the marshalled properties of the request
+        """
+        with self._lock:
+            if self._index is None:
+                self._index = self._read_index()
+            entries = list(self._index.items())
+        # Entries do not record their API URL and credentials, but their key does.
+        return [(key, properties) for key, (properties, stored_at) in entries
+                if properties is not None and self.key(api_url, properties, credentials) == key
+                and CacheEntry(b"", stored_at=stored_at).is_fresh(self._ttl)]
+
+    def _read_index(self):
+        # The properties of the entries are read from disk once, then kept up to date by put and remove. Entries
+        # written to the directory by other processes afterwards are not listed.
+        index = dict()
+        for name in os.listdir(self._directory):
+            if not name.endswith(".meta"):
+                continue
+            try:
+                with open(os.path.join(self._directory, name), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            index[name[:-len(".meta")]] = (meta.get("properties"), meta.get("stored_at", 0.0))
+        return index
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the bodies stored on disk fit within max_bytes.
+        :return: none
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self._directory):
+            if not name.endswith(".body"):
+                continue
+            try:
+                st = os.stat(os.path.join(self._directory, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name[:-len(".body")]))
+            total += st.st_size
+        entries.sort()
+        for _, size, key in entries:
+            if total <= self._max_bytes:
+                break
+            self.remove(key)
+            total -= size
+
+    def remove(self, key):
+        """
+        :param key: the key of the entry to remove from the cache
+        :return: none
+        """
+        for path in (self._body_path(key), self._meta_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            if self._index is not None:
+                self._index.pop(key, None)
+
+    def clear(self):
+        """
+        Removes every entry from the cache and resets the counters.
+        :return: none
+        """
+        for name in os.listdir(self._directory):
+            if name.endswith(".body"):
+                self.remove(name[:-len(".body")])
+        self._reset_counters()
+
+    def _write(self, path, data):
+        # Write to a temporary file first so that concurrent readers never see a partial entry.
+        with atomic.replacing(path) as tmp:
+            with open(tmp, "wb") as f:
+                f.write(data)
+
+    def _body_path(self, key):
+        return os.path.join(self._directory, key + ".body")
+
+    def _meta_path(self, key):
+        return os.path.join(self._directory, key + ".meta")
+
+
+class MemoryCache(BaseCache):
+    """
+    A cache holding the responses in memory rather than on disk, e.g. for the lifetime of a client.Client.
+    With the default ttl of 0, every request is revalidated: the server is asked for the response only if it changed
+    since the ETag or Last-Modified it sent for the same query, and an unchanged response costs a bodiless 304 instead
+    of a full download.
+    """
+
+    def __init__(self, ttl=0, max_bytes=DEFAULT_MAX_MEMORY_BYTES):
+        super().__init__(ttl)
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (CacheEntry, properties), least recently used first
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, body, etag="", last_modified="", properties=None):
+        with self._lock:
+            self._entries[key] = (CacheEntry(body, etag, last_modified, time.time()), properties)
+            self._entries.move_to_end(key)
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            total = sum(len(entry.body) for entry, _ in self._entries.values())
+            while total > self._max_bytes and len(self._entries) > 0:
+                _, (entry, _) = self._entries.popitem(last=False)
+                total -= len(entry.body)
+
+    def remove(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self._reset_counters()
+
+    def fresh_properties(self, api_url, credentials=None):
+        with self._lock:
+            return [(key, properties) for key, (entry, properties) in self._entries.items()
+                    if properties is not None and self.key(api_url, properties, credentials) == key
+                    and entry.is_fresh(self._ttl)]
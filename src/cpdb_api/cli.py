@@ -0,0 +1,154 @@
+"""The cpdb-api command line tool."""
+
+import argparse
+import os
+import sys
+import time
+
+from cpdb_api import atomic, batch, columnar, request
+from cpdb_api.client import Client
+
+# The properties a download can be sharded by, one request and one partition per value.
+PARTITION_PROPERTIES = ("country_iso", "decision_date")
+DEFAULT_ROUNDS = 3
+DEFAULT_RETRY_DELAY = 5  # seconds, doubled after each round
+
+
+def shard_values(by, values):
+    """
+    :param by: one of PARTITION_PROPERTIES
+    :param values: the values to shard by. Years may be given as ranges, e.g. 2010-2015.
+    :return: the list of distinct values, in the order given
+    :raises ValueError: if a year is not an integer or a range of those
+    """
+    if by not in PARTITION_PROPERTIES:
+        raise ValueError("by must be one of %s, got %r" % (", ".join(PARTITION_PROPERTIES), by))
+    shards = []
+    for value in values:
+        if by == "decision_date":
+            years = value.split("-", 1)
+            if not all(year.strip().isdigit() for year in years):
+                raise ValueError("years must be integers or ranges of those, e.g. 2010-2015, got %r" % value)
+            shards += [str(year) for year in range(int(years[0]), int(years[-1]) + 1)]
+        else:
+            shards.append(value.upper() if by == "country_iso" else value)
+    return list(dict.fromkeys(shards))
+
+
+def partition_path(output, by, value):
+    """
+    :return: the path of the file holding the policies of a shard, in a hive-style directory, e.g.
+    output/country_iso=IND/part-0.parquet
+    """
+    return os.path.join(output, "%s=%s" % (by, value), "part-0.parquet")
+
+
+def export(output, by, values, api_url=request.API_URL, client=None, max_workers=batch.DEFAULT_MAX_WORKERS,
+           rounds=DEFAULT_ROUNDS, retry_delay=DEFAULT_RETRY_DELAY, compression=columnar.DEFAULT_COMPRESSION):
+    """
+    Downloads the policies matching each of values, concurrently, and writes each shard to its own Parquet file under
+    output, partitioned hive-style so that engines reading the dataset can skip partitions. The partition column is
+    stored in the directory names only. Shards that fail are retried on their own, up to rounds times, without
+    downloading the other shards again. Requires pyarrow.
+    :param output: the directory to write the dataset to
+    :param by: the property to shard by, one of PARTITION_PROPERTIES
+    :param values: the values of by to download
+    :param api_url: the URL of the API
+    :param client: the client.Client to issue the requests through, or None for a new one
+    :param max_workers: the maximum number of shards downloaded at the same time
+    :param rounds: the number of times a shard is attempted
+    :param retry_delay: the number of seconds to wait before retrying failed shards, doubled after each round
+    :param compression: the compression of the Parquet files
+    :return: a dict mapping each exported value to its number of policies, and a dict mapping each value that could
+    not be exported to its last error
+    """
+    columnar.require_pyarrow()  # fail before downloading anything
+    exported = dict()
+    pending = list(values)
+    errors = dict()
+    for attempt in range(rounds):
+        if attempt > 0:
+            time.sleep(retry_delay * 2 ** (attempt - 1))
+        reqs = []
+        for value in pending:
+            r = request.Request(api_url=api_url)
+            if by == "country_iso":
+                r.set_country(value)
+            else:
+                r.set_decision_date(int(value))
+            reqs.append(r)
+        result = batch.issue_all(reqs, max_workers=max_workers, client=client)
+        errors = {pending[i]: e for i, e in result.errors.items()}
+        for value, df in zip(pending, result.frames):
+            if df is None:
+                continue
+            path = partition_path(output, by, value)
+            if len(df) > 0:
+                _write(df.drop(columns=[by], errors="ignore"), path, compression)
+            elif os.path.exists(path):
+                os.remove(path)  # left by an earlier export, when the shard still had policies
+            exported[value] = len(df)
+        pending = [value for value in pending if value in errors]
+        if len(pending) == 0:
+            break
+    return exported, errors
+
+
+def _write(df, path, compression):
+    # Write to a temporary file first so that an interrupted export never leaves a partial partition.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with atomic.replacing(path) as tmp:
+        columnar.save_parquet(df, tmp, compression, schema=_schema(df))
+
+
+def _schema(df):
+    # Text is always written as string, whatever the values of the shard: a column holding only nulls in a shard would
+    # otherwise be written as a null column, which cannot be read together with the string column of other shards.
+    pa = columnar.require_pyarrow()
+    text = (pa.types.is_null, pa.types.is_string, pa.types.is_large_string)
+    return pa.schema([pa.field(f.name, pa.string()) if any(is_type(f.type) for is_type in text) else f
+                      for f in pa.Schema.from_pandas(df, preserve_index=False)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cpdb-api", description="Command line tool for the ClimatePolicy DataBase.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser(
+        "export",
+        help="Download policies in parallel shards into a partitioned Parquet dataset.",
+        description="Download the policies of each country or year in parallel, and write them to a Parquet "
+                    "dataset partitioned hive-style by that property, e.g. OUTPUT/country_iso=IND/part-0.parquet. "
+                    "Requires pyarrow.",
+    )
+    export_parser.add_argument("output", help="Directory to write the dataset to.")
+    export_parser.add_argument("--by", choices=PARTITION_PROPERTIES, default="country_iso",
+                               help="Property to shard the download and partition the dataset by.")
+    export_parser.add_argument("--values", nargs="+", required=True,
+                               help="Country ISO codes or years to download, e.g. IND DEU or 2010-2020. Sharding by "
+                                    "year leaves out the policies without a decision date.")
+    export_parser.add_argument("--api_url", default=request.API_URL, help="URL of the API.")
+    export_parser.add_argument("--api_user", default="", help="Username for authenticating to the API.")
+    export_parser.add_argument("--api_password", default="", help="Password for authenticating to the API.")
+    export_parser.add_argument("--max_workers", type=int, default=batch.DEFAULT_MAX_WORKERS,
+                               help="Maximum number of shards downloaded at the same time.")
+    export_parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS,
+                               help="Number of times a failing shard is attempted.")
+    export_parser.add_argument("--compression", default=columnar.DEFAULT_COMPRESSION,
+                               help="Compression of the Parquet files: snappy, gzip, brotli, lz4 or zstd.")
+    args = parser.parse_args(argv)
+
+    try:
+        values = shard_values(args.by, args.values)
+    except ValueError as e:
+        export_parser.error(str(e))
+    with Client(args.api_user, args.api_password, pool_size=args.max_workers) as client:
+        exported, errors = export(args.output, args.by, values, api_url=args.api_url, client=client,
+                                  max_workers=args.max_workers, rounds=args.rounds, compression=args.compression)
+    print("exported %d policies in %d shards to %s" % (sum(exported.values()), len(exported), args.output))
+    for value, e in errors.items():
+        print("failed to export %s=%s: %s" % (args.by, value, e), file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""A reusable, connection-pooled client for the ClimatePolicy DataBase (CPDB) API."""
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5  # seconds
+DEFAULT_TIMEOUT = 60  # seconds
+# Responses with these status codes are transient and retried.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class Client:
+    """
+    A client holding a pooled requests.Session, credentials and default headers. Requests issued through the same
+    Client (see Request.set_client) reuse open connections instead of performing a new TCP and TLS handshake for each
+    query, and are retried with exponential backoff on connection errors and on the statuses in RETRY_STATUSES.
+
+    A Client may be shared between threads.
+    """
+
+    def __init__(self, api_user="", api_password="", headers=None, pool_size=DEFAULT_POOL_SIZE,
+                 retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR, timeout=DEFAULT_TIMEOUT,
+                 instrumentation=None, cache=None):
+        """
+        :param api_user: the username used for authenticating to the API
+        :param api_password: the password used for authenticating to the API
+        :param headers: a dict of headers sent with every request
+        :param pool_size: the maximum number of connections kept open per host. Should be at least the number of
+        threads issuing requests concurrently.
+        :param retries: the number of times a failed request is retried. 0 disables retries.
+        :param backoff_factor: the base of the exponential backoff between retries, in seconds. A Retry-After header
+        sent by the server takes precedence.
+        :param timeout: the connect and read timeout of a single attempt, in seconds
+        :param instrumentation: the instrumentation.Instrumentation receiving the measurements of the requests issued
+        through this client, unless they have their own
+        :param cache: the cache.BaseCache used by the requests issued through this client, unless they have their
+        own. A cache.MemoryCache remembers the validators of each query, so that unchanged results come back as 304s.
+        """
+        self._timeout = timeout
+        self._credentials = (api_user, api_password) if api_user != "" else None
+        self.instrumentation = instrumentation
+        self.cache = cache
+        self._session = requests.Session()
+        if api_user != "":
+            self._session.auth = HTTPBasicAuth(api_user, api_password)
+        if headers is not None:
+            self._session.headers.update(headers)
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=frozenset(["GET", "HEAD"]), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def get(self, url, params=None, headers=None, auth=None, stream=False):
+        """
+        Issues a GET request through the pooled session.
+        :param url: the URL to request
+        :param params: the query parameters of the request
+        :param headers: headers to send in addition to the default headers of this client
+        :param auth: credentials overriding the ones of this client, if any
+        :param stream: if True, the body is not downloaded until it is accessed
+        :return: the requests.Response. Retries are exhausted before a transient error status is returned.
+        """
+        return self._session.get(url, params=params, headers=headers, auth=auth, timeout=self._timeout,
+                                 stream=stream)
+
+    def credentials(self):
+        """
+        :return: the (user, password) pair this client authenticates with, or None if it does not
+        """
+        return self._credentials
+
+    def close(self):
+        """
+        Closes all pooled connections.
+        :return: none
+        """
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,65 @@
+"""Columnar (Parquet and Feather) persistence of policy DataFrames. Requires the optional pyarrow dependency."""
+
+DEFAULT_COMPRESSION = "zstd"
+
+
+def require_pyarrow():
+    """
+    :return: the pyarrow module, with its feather and parquet modules imported
+    :raises ImportError: if pyarrow is not installed
+    """
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("columnar formats require pyarrow: pip install cpdb-api[arrow]") from e
+    return pyarrow
+
+
+def save_parquet(df, path, compression=DEFAULT_COMPRESSION, schema=None):
+    """
+    :param df: the DataFrame to save
+    :param path: the file to save the data to
+    :param compression: one of snappy, gzip, brotli, lz4, zstd or None
+    :param schema: the pyarrow.Schema of the file, or None to infer it from the values of df
+    :return: none
+    """
+    pa = require_pyarrow()
+    pa.parquet.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False), path,
+                           compression=compression)
+
+
+def save_feather(df, path, compression=DEFAULT_COMPRESSION):
+    """
+    Saves a DataFrame in the Feather (Arrow IPC) format. Uncompressed files can be memory-mapped without copying
+    when they are loaded.
+    :param df: the DataFrame to save
+    :param path: the file to save the data to
+    :param compression: one of lz4, zstd or uncompressed
+    :return: none
+    """
+    pa = require_pyarrow()
+    pa.feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), path, compression=compression)
+
+
+def load_parquet(path, columns=None, memory_map=True):
+    """
+    :param path: the file to load the data from
+    :param columns: the columns to load. Other columns are not read from disk. All columns are loaded if None.
+    :param memory_map: if True, the file is memory-mapped instead of read into a buffer
+    :return: a DataFrame
+    """
+    pa = require_pyarrow()
+    return pa.parquet.read_table(path, columns=columns, memory_map=memory_map).to_pandas()
+
+
+def load_feather(path, columns=None, memory_map=True):
+    """
+    :param path: the file to load the data from
+    :param columns: the columns to load. Other columns are not read from disk. All columns are loaded if None.
+    :param memory_map: if True, the file is memory-mapped instead of read into a buffer
+    :return: a DataFrame
+    """
+    pa = require_pyarrow()
+    return pa.feather.read_table(path, columns=columns, memory_map=memory_map).to_pandas()
@@ -0,0 +1,83 @@
+"""Pluggable JSON decoding of API responses, using the fastest installed backend."""
+
+import json
+
+
+class JsonDecoder:
+    """
+    Decodes with the json module of the standard library. Always available.
+    """
+
+    name = "json"
+
+    def decode(self, body):
+        """
+        :param body: a UTF-8 encoded JSON document, as bytes
+        :return: the decoded document
+        """
+        return json.loads(body)
+
+
+class OrjsonDecoder:
+    """
+    Decodes with orjson, which parses the bytes of the body directly, without decoding them to a str first, and is
+    faster than the standard library on large responses. Requires the optional orjson dependency.
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._loads = orjson.loads
+
+    def decode(self, body):
+        """
+        :param body: a UTF-8 encoded JSON document, as bytes
+        :return: the decoded document
+        """
+        return self._loads(body)
+
+
+# Decoders by name, in order of preference.
+DECODERS = {
+    OrjsonDecoder.name: OrjsonDecoder,
+    JsonDecoder.name: JsonDecoder,
+}
+_default = None
+
+
+def register_decoder(cls, preferred=False):
+    """
+    Makes a decoder available to get_decoder. A decoder is a class with a name attribute and a decode(body) method,
+    whose constructor raises ImportError when its backend is not installed.
+    :param cls: the decoder class
+    :param preferred: if True, the decoder is preferred over the ones already registered
+    :return: none
+    """
+    global DECODERS, _default
+    if preferred:
+        DECODERS = dict([(cls.name, cls)] + [(name, c) for name, c in DECODERS.items() if name != cls.name])
+    else:
+        DECODERS[cls.name] = cls
+    _default = None
+
+
+def get_decoder(name=None):
+    """
+    :param name: the name of the decoder, or None for the most preferred decoder whose backend is installed
+    :return: a decoder
+    :raises ImportError: if the backend of the named decoder is not installed
+    """
+    global _default
+    if name is not None:
+        if name not in DECODERS:
+            raise ValueError("unknown decoder %r, expected one of %s" % (name, ", ".join(DECODERS)))
+        return DECODERS[name]()
+    if _default is None:
+        for cls in DECODERS.values():
+            try:
+                _default = cls()
+                break
+            except ImportError:
+                continue
+    return _default
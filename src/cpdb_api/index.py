@@ -0,0 +1,149 @@
+"""A bitmap index over the filterable fields of the ClimatePolicy DataBase (CPDB)."""
+
+import numpy as np
+import pandas as pd
+
+from cpdb_api.snapshot import CONTAINS_PROPERTIES, EXACT_PROPERTIES, FIRST_VALUE_PROPERTIES, normalize_properties
+
+
+class PolicyIndex:
+    """
+    An inverted index mapping each distinct value of the filterable fields (country, decision year, status, sector,
+    policy instrument and policy type) to the set of rows holding it. Row sets are bitmaps stored as Python integers,
+    so that combining the filters of a Request is a handful of AND/OR operations instead of a scan over every row.
+
+    Multi-valued fields are indexed per value: a filter matches a value if it is contained in it, case-insensitively,
+    as the API does. Unlike the API, a filter spanning the comma between two values (e.g. "heat,Coal") matches
+    nothing.
+
+    A PolicyIndex answers queries like a snapshot.Snapshot, and can be passed to Request.set_snapshot.
+    """
+
+    def __init__(self, df):
+        """
+        :param df: a DataFrame of policies, with the column names used by the API
+        """
+        self._data_frame = df.reset_index(drop=True)
+        self._rows = len(self._data_frame)
+        self._all = (1 << self._rows) - 1
+        # field -> lower-cased value -> bitmap, and lower-cased value -> value as spelled in the data
+        self._bitmaps = dict()
+        self._names = dict()
+        for key in EXACT_PROPERTIES + FIRST_VALUE_PROPERTIES + CONTAINS_PROPERTIES:
+            if key in self._data_frame.columns:
+                self._index_column(key)
+        self._lookups = dict()
+
+    @classmethod
+    def from_snapshot(cls, s):
+        """
+        :param s: a snapshot.Snapshot
+        :return: a PolicyIndex over the policies of the snapshot
+        """
+        return cls(s.data_frame)
+
+    @property
+    def data_frame(self):
+        return self._data_frame
+
+    def bitmap(self, properties):
+        """
+        :param properties: the marshalled properties of a Request
+        :return: the bitmap of the rows matched by the properties. Bit i is set if row i matches.
+        """
+        result = self._all
+        for key, values in normalize_properties(properties).items():
+            if key not in self._bitmaps:
+                raise ValueError("the index has no column %r" % key)
+            if key in FIRST_VALUE_PROPERTIES:
+                values = values[:1]
+            matched = 0
+            for value in values:
+                matched |= self._lookup(key, value)
+            result &= matched
+        return result
+
+    def positions(self, properties):
+        """
+        :param properties: the marshalled properties of a Request
+        :return: a numpy array of the positions of the rows matched by the properties, in ascending order
+        """
+        return self._positions(self.bitmap(properties))
+
+    def count(self, properties):
+        """
+        :param properties: the marshalled properties of a Request
+        :return: the number of rows matched by the properties
+        """
+        return bin(self.bitmap(properties)).count("1")
+
+    def query(self, properties):
+        """
+        :param properties: the marshalled properties of a Request
+        :return: a DataFrame of the policies matched by the properties, shaped like the result of Request.issue
+        """
+        return self._data_frame.iloc[self.positions(properties)].reset_index(drop=True)
+
+    def facets(self, field, properties=None):
+        """
+        Counts the rows holding each value of a field, among the rows matched by properties.
+        :param field: the field to count the values of, e.g. "sector"
+        :param properties: the marshalled properties of a Request. All rows are counted if None.
+        :return: a dict mapping each value of the field, as spelled in the data, to its number of rows. Values
+        without any matching row are omitted.
+        """
+        selected = self.bitmap(properties)
+        counts = dict()
+        for value, bitmap in self._bitmaps[field].items():
+            n = bin(bitmap & selected).count("1")
+            if n > 0:
+                counts[self._names[field][value]] = n
+        return counts
+
+    def _index_column(self, key):
+        column = self._data_frame[key]
+        if key in FIRST_VALUE_PROPERTIES:
+            values = pd.to_numeric(column, errors="coerce").dropna().astype(int).astype(str)
+        elif key in EXACT_PROPERTIES:
+            values = column.dropna().astype(str)
+        else:
+            values = column.dropna().astype(str).str.split(",").explode().str.strip()
+            values = values[values != ""]
+        lowered = values.str.lower()
+        codes, uniques = pd.factorize(lowered)
+        # Group the row positions by value: sort once, then split where the value changes.
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        starts = np.flatnonzero(np.diff(codes, prepend=-1))
+        groups = np.split(values.index.to_numpy()[order], starts[1:])
+        self._bitmaps[key] = {uniques[codes[start]]: self._bitmap(group) for start, group in zip(starts, groups)}
+        first = ~lowered.duplicated().to_numpy()
+        self._names[key] = dict(zip(lowered[first], values[first]))
+
+    def _lookup(self, key, value):
+        # Resolving a value against the vocabulary of a field is cached: browsing repeats the same values.
+        cache_key = (key, value.lower())
+        if cache_key not in self._lookups:
+            bitmaps = self._bitmaps[key]
+            if key in CONTAINS_PROPERTIES:
+                matched = 0
+                for v, bitmap in bitmaps.items():
+                    if value.lower() in v:
+                        matched |= bitmap
+            elif key in FIRST_VALUE_PROPERTIES:
+                year = pd.to_numeric(value, errors="coerce")
+                matched = 0 if pd.isna(year) else bitmaps.get(str(int(year)), 0)
+            else:
+                matched = bitmaps.get(value.lower(), 0)
+            self._lookups[cache_key] = matched
+        return self._lookups[cache_key]
+
+    def _bitmap(self, positions):
+        bits = np.zeros(self._rows, dtype=bool)
+        bits[positions] = True
+        return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+    def _positions(self, bitmap):
+        data = bitmap.to_bytes((self._rows + 7) // 8, "little")
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder="little")[:self._rows]
+        return np.flatnonzero(bits)
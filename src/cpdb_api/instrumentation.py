@@ -0,0 +1,106 @@
+"""Timing and size measurements of the phases of Request.issue, delivered to a callback or to logging."""
+
+import logging
+import time
+from contextlib import contextmanager
+
+LOGGER = logging.getLogger("cpdb_api")
+
+# The phases of Request.issue, in order. Only the phases a request goes through are measured.
+PHASES = (
+    "ttfb",  # sending the request until the response headers arrive; includes DNS, TCP and TLS on new connections
+    "transfer",  # downloading the response body
+    "decode",  # decoding the JSON body
+    "frame",  # building the DataFrame
+    "query",  # evaluating the request against a snapshot or a stored result
+    "fan_out",  # issuing and merging the sub-requests of a request with Request.set_fan_out
+)
+
+
+class Trace:
+    """
+    The measurements of a single call to Request.issue:
+    - spans: the seconds spent in each phase, see PHASES;
+    - bytes_received: the size of the response body as transferred, before decompression;
+    - bytes_decoded: the size of the response body after decompression;
+    - rows: the number of policies returned;
+    - retries: the number of attempts that failed and were retried by the client;
+    - cache: "hit", "revalidated" or "miss" if the request went through a cache, "reused" if it was answered from a
+      broader result (see reuse.ResultStore), None otherwise.
+    """
+
+    def __init__(self, api_url, properties):
+        self.api_url = api_url
+        self.properties = properties
+        self.spans = dict()
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self.rows = 0
+        self.retries = 0
+        self.cache = None
+
+    @contextmanager
+    def span(self, phase):
+        """
+        Measures the time spent in the body of the with statement, adding it to phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[phase] = self.spans.get(phase, 0.0) + time.perf_counter() - start
+
+    def record_response(self, resp):
+        """
+        Records the sizes and retries of a requests.Response whose body has been read.
+        """
+        self.bytes_decoded += len(resp.content)
+        raw = getattr(resp, "raw", None)
+        received = getattr(raw, "tell", lambda: None)()
+        self.bytes_received += received if isinstance(received, int) else len(resp.content)
+        history = getattr(getattr(raw, "retries", None), "history", None)
+        if isinstance(history, tuple):
+            self.retries += len(history)
+
+    def as_dict(self):
+        return dict(api_url=self.api_url, properties=self.properties, spans=dict(self.spans),
+                    total=sum(self.spans.values()), bytes_received=self.bytes_received,
+                    bytes_decoded=self.bytes_decoded, rows=self.rows, retries=self.retries, cache=self.cache)
+
+
+class Instrumentation:
+    """
+    Receives a Trace for each call to Request.issue (see Request.set_instrumentation and client.Client), and passes
+    it, as a dict, to callback, and logs it on logger at level if that level is enabled.
+    """
+
+    def __init__(self, callback=None, logger=LOGGER, level=logging.DEBUG):
+        """
+        :param callback: a callable receiving the dict of each Trace, e.g. to feed a metrics pipeline
+        :param logger: the logging.Logger traces are logged on, or None to disable logging
+        :param level: the level traces are logged at
+        """
+        self._callback = callback
+        self._logger = logger
+        self._level = level
+
+    def emit(self, trace):
+        """
+        :param trace: the Trace of a finished request
+        :return: none
+        """
+        if self._callback is None and (self._logger is None or not self._logger.isEnabledFor(self._level)):
+            return
+        values = trace.as_dict()
+        if self._callback is not None:
+            self._callback(values)
+        if self._logger is not None and self._logger.isEnabledFor(self._level):
+            self._logger.log(self._level, "issued %s %s: %d rows, %d bytes, %d retries, cache %s, %s",
+                             values["api_url"], values["properties"], values["rows"], values["bytes_received"],
+                             values["retries"], values["cache"],
+                             ", ".join("%s %.3fs" % (k, v) for k, v in values["spans"].items()),
+                             extra={"cpdb_trace": values})
+
+
+# Logs traces on the "cpdb_api" logger at DEBUG level. Used by requests without instrumentation of their own.
+DEFAULT_INSTRUMENTATION = Instrumentation()
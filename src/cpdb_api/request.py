@@ -1,12 +1,44 @@
 """A Python API for NewClimate Institute's ClimatePolicy DataBase (CPDB)."""
 
+import itertools
 import json
+from contextlib import closing
 
-import pandas as pd
 import requests
 from requests.auth import HTTPBasicAuth
 
+# pandas is only imported once a DataFrame is built, so that callers of Request.issue(as_frame=False) never load it.
+from cpdb_api import atomic, batch, columnar, decode, instrumentation, stream
+from cpdb_api.cache import CacheEntry
+
 API_URL = 'https://climatepolicydatabase.org/api/v1/climate-policies'
+DEFAULT_ROWS_PER_CHUNK = 10000
+# The multi-valued properties split into single-valued sub-requests by Request.set_fan_out. The server honours only the
+# first value of a decision_date list, and returns a policy once per matching value of the other ones.
+FAN_OUT_PROPERTIES = ("decision_date", "sector", "policy_instrument", "policy_type")
+# The attribute of Request holding each marshalled property.
+_PROPERTY_ATTRIBUTES = {
+    "country_iso": "_country",
+    "decision_date": "_decision_date",
+    "policy_status": "_policy_status",
+    "sector": "_sector",
+    "policy_instrument": "_policy_instrument",
+    "policy_type": "_mitigation_area",
+}
+
+
+def fan_out(properties):
+    """
+    Splits marshalled properties into single-valued ones, one per combination of the values of the properties in
+    FAN_OUT_PROPERTIES. A policy matches properties if and only if it matches at least one of the returned ones.
+    :param properties: the marshalled properties of a Request
+    :return: a list of properties
+    """
+    from cpdb_api.snapshot import split_values
+
+    names = [name for name in FAN_OUT_PROPERTIES if name in properties]
+    values = [split_values(properties[name]) for name in names]
+    return [dict(properties, **dict(zip(names, combination))) for combination in itertools.product(*values)]
 
 
 class Request:
@@ -29,6 +61,14 @@ class Request:
         self._mitigation_area = ""
         self._data_frame = ""
         self._properties = dict()
+        self._cache = None
+        self._client = None
+        self._snapshot = None
+        self._instrumentation = None
+        self._decoder = None
+        self._fan_out = False
+        self._result_store = None
+        self._fan_out_workers = batch.DEFAULT_MAX_WORKERS
 
     def set_country(self, c):
         """
@@ -40,10 +80,13 @@ class Request:
 
     def set_decision_date(self, d):
         """
-        Sets the decision date to provided year.
-        :param d: the decision date in YYYY format as an integer
+        Sets the decision date to provided year. Several years, e.g. range(2010, 2015), are only all honoured with
+        Request.set_fan_out; otherwise the server only uses the first one.
+        :param d: the decision date in YYYY format as an integer, or a list or range of those
         :return: none
         """
+        if isinstance(d, (list, tuple, range)):
+            d = ",".join(str(year) for year in d)
         self._decision_date = d
 
     def set_policy_status(self, s):
@@ -66,6 +109,8 @@ class Request:
         :param sector: a list of sectors to add to the query.
         :return: none
         """
+        if isinstance(sector, (list, tuple)):
+            sector = ",".join(sector)
         if self._sector == "":
           self._sector = sector
         else:
@@ -82,6 +127,8 @@ class Request:
         :param policy_instrument: a list of policy instruments to add to the query.
         :return: none
         """
+        if isinstance(policy_instrument, (list, tuple)):
+            policy_instrument = ",".join(policy_instrument)
         if self._policy_instrument == "":
           self._policy_instrument = policy_instrument
         else:
@@ -96,24 +143,153 @@ class Request:
         :param mitigation_area: a list of policy types to add to the query.
         :return: none
         """
+        if isinstance(mitigation_area, (list, tuple)):
+            mitigation_area = ",".join(mitigation_area)
         if self._mitigation_area == "":
           self._mitigation_area = mitigation_area
         else:
           self._mitigation_area = ",".join([self._mitigation_area, mitigation_area])
 
     # For request issuing & data retrieval.
-    def issue(self):
+    def issue(self, compact=False, as_frame=True):
         """
         Issues this request against the API.
+        :param compact: if True, the columns of the result are converted to compact types, see schema.compact_frame
+        :param as_frame: if False, the decoded policies are returned as a list of dicts instead of a DataFrame. Unless
+        the request is answered from a snapshot, a result store or sub-requests, pandas is then never imported.
         :return: the response from the server
         """
+        if compact and not as_frame:
+            raise ValueError("compact requires as_frame")
         req = self.marshal()
-        resp = requests.get(self._api_url, auth=HTTPBasicAuth(self._api_user, self._api_password), params = req)
-        resp.raise_for_status()  # raise any produced error
-        self._response = resp.json()
-        self._data_frame = pd.DataFrame.from_dict(self._response)
+        trace = instrumentation.Trace(self._api_url, req)
+        fanned_out = self._fan_out and len(fan_out(req)) > 1
+        reused = None
+        if self._result_store is not None and self._snapshot is None and not fanned_out:
+            with trace.span("query"):
+                reused = self._result_store.answer(self._api_url, req, self._credentials())
+        if reused is not None:
+            self._response = None
+            trace.cache = "reused"
+            df = reused
+        elif self._snapshot is not None:
+            # The policies are already in memory: only the DataFrame is kept, not a copy as records.
+            self._response = None
+            with trace.span("query"):
+                df = self._snapshot.query(req)
+        elif fanned_out:
+            self._response = None
+            with trace.span("fan_out"):
+                df = self._issue_fanned_out(fan_out(req))
+        else:
+            responses = []
+
+            def get(params, headers=None):
+                responses.append(self._traced_get(trace, params, headers))
+                return responses[-1]
+
+            cache = self._cache
+            if cache is None and self._client is not None:
+                cache = self._client.cache
+            if cache is not None:
+                body = cache.fetch(get, self._api_url, req, self._credentials())
+                if len(responses) == 0:
+                    trace.cache = "hit"
+                else:
+                    trace.cache = "revalidated" if responses[-1].status_code == 304 else "miss"
+            else:
+                resp = get(req)
+                resp.raise_for_status()  # raise any produced error
+                body = resp.content
+            with trace.span("decode"):
+                self._response = (self._decoder or decode.get_decoder()).decode(body)
+            if not as_frame:
+                self._data_frame = None
+                trace.rows = len(self._response)
+                self._emit(trace)
+                return self._response
+            import pandas as pd
+
+            with trace.span("frame"):
+                df = pd.DataFrame.from_dict(self._response)
+            if self._result_store is not None:
+                self._result_store.put(self._api_url, req, df, self._credentials())
+        if compact:
+            from cpdb_api import schema
+
+            with trace.span("frame"):
+                df = schema.compact_frame(df)
+        self._data_frame = df
+        trace.rows = len(self._data_frame)
+        self._emit(trace)
+        if not as_frame:
+            return df.to_dict(orient="records")
         return self._data_frame
 
+    def iter_records(self, chunk_size=stream.DEFAULT_CHUNK_SIZE):
+        """
+        Issues this request against the API and streams the response, yielding each policy as soon as it has been
+        read. Unlike Request.issue, the full response is never held in memory and is not kept on this request, so
+        Request.save_json and Request.save_csv have nothing to save afterwards. Streamed requests bypass the cache.
+        :param chunk_size: the number of bytes read from the connection at a time
+        :return: a generator of policies, as dicts
+        """
+        resp = self._get(self.marshal(), stream=True)
+        with closing(resp):
+            resp.raise_for_status()  # raise any produced error
+            yield from stream.iter_json_array(resp.iter_content(chunk_size))
+
+    def iter_chunks(self, n=DEFAULT_ROWS_PER_CHUNK):
+        """
+        Like Request.iter_records, but yields the policies as DataFrames of at most n rows each.
+        :param n: the maximum number of rows per DataFrame
+        :return: a generator of DataFrames
+        """
+        import pandas as pd
+
+        records = []
+        for record in self.iter_records():
+            records.append(record)
+            if len(records) == n:
+                yield pd.DataFrame.from_dict(records)
+                records = []
+        if len(records) > 0:
+            yield pd.DataFrame.from_dict(records)
+
+    def issue_conditional(self, etag="", last_modified=""):
+        """
+        Issues this request against the API with a conditional GET, bypassing the cache, e.g. to check whether a copy
+        of the result kept elsewhere is still up to date.
+        :param etag: the ETag the server sent with the copy, if any
+        :param last_modified: the Last-Modified header the server sent with the copy, if any
+        :return: the requests.Response, with status 304 and no body if the result did not change since
+        """
+        return self._get(self.marshal(), CacheEntry(b"", etag, last_modified).conditional_headers())
+
+    def issue_to_file(self, path, format="json", compression=None, chunk_size=stream.DEFAULT_CHUNK_SIZE):
+        """
+        Issues this request against the API and streams the response straight to a file, without parsing it into a
+        DataFrame. Memory use does not depend on the size of the response. Streamed requests bypass the cache. The
+        response is streamed to a temporary file which only replaces path once it is complete, so a failed download
+        never leaves a truncated file at path.
+        :param path: the file to save the data to
+        :param format: json to save the response as sent by the server, ndjson for one policy per line, or csv
+        :param compression: None, gzip or zstd. zstd requires the zstandard package.
+        :param chunk_size: the number of bytes read from the connection at a time
+        :return: none
+        """
+        if format not in stream.FILE_FORMATS:
+            raise ValueError("format must be one of %s, got %r" % (", ".join(stream.FILE_FORMATS), format))
+        resp = self._get(self.marshal(), stream=True)
+        with closing(resp):
+            resp.raise_for_status()  # raise any produced error
+            with atomic.replacing(path) as tmp, stream.open_output(tmp, compression) as f:
+                if format == "json":
+                    for chunk in resp.iter_content(chunk_size):
+                        f.write(chunk)
+                else:
+                    stream.write_records(stream.iter_json_array(resp.iter_content(chunk_size)), f, format)
+
     # For saving data in different formats
     def save_json(self, path):
         """
@@ -121,6 +297,9 @@ class Request:
         self._response type
         :return: none
         """
+        if self._response is None:
+            self._data_frame.to_json(path, orient="records")
+            return
         with open(path, 'w', encoding="utf-8") as f:
             json.dump(self._response, f)
 
@@ -135,6 +314,30 @@ class Request:
           return
         self._data_frame.to_csv(path)
 
+    def save_parquet(self, path, compression=columnar.DEFAULT_COMPRESSION):
+        """
+        Saves the data in the Parquet format. Reload it with columnar.load_parquet. Requires pyarrow.
+        :param path: the file to save the data to
+        :param compression: one of snappy, gzip, brotli, lz4, zstd or None
+        :return: none
+        """
+        if self._data_frame is None:
+          print("No dataframe set, unable to export to Parquet")
+          return
+        columnar.save_parquet(self._data_frame, path, compression)
+
+    def save_feather(self, path, compression=columnar.DEFAULT_COMPRESSION):
+        """
+        Saves the data in the Feather (Arrow IPC) format. Reload it with columnar.load_feather. Requires pyarrow.
+        :param path: the file to save the data to
+        :param compression: one of lz4, zstd or uncompressed. Uncompressed files are memory-mapped without copying.
+        :return: none
+        """
+        if self._data_frame is None:
+          print("No dataframe set, unable to export to Feather")
+          return
+        columnar.save_feather(self._data_frame, path, compression)
+
     # Helpers for issuing the request
     def marshal(self):
         """
@@ -160,6 +363,53 @@ class Request:
         self._properties = properties
         return properties
 
+    def _credentials(self):
+        # The credentials the request is sent with, see _get.
+        if self._api_user != "" or self._client is None:
+            return (self._api_user, self._api_password) if self._api_user != "" else None
+        return self._client.credentials()
+
+    def _get(self, params, headers=None, stream=False):
+        if self._client is not None:
+            # Only override the credentials of the client when this request has its own.
+            auth = HTTPBasicAuth(self._api_user, self._api_password) if self._api_user != "" else None
+            return self._client.get(self._api_url, params=params, headers=headers, auth=auth, stream=stream)
+        return requests.get(self._api_url, auth=HTTPBasicAuth(self._api_user, self._api_password), params=params,
+                            headers=headers, stream=stream)
+
+    def _issue_fanned_out(self, properties):
+        subs = []
+        for p in properties:
+            sub = Request(api_url=self._api_url)
+            for name, value in p.items():
+                setattr(sub, _PROPERTY_ATTRIBUTES[name], value)
+            sub._api_user, sub._api_password = self._api_user, self._api_password
+            sub._cache, sub._decoder, sub._instrumentation = self._cache, self._decoder, self._instrumentation
+            sub._result_store = self._result_store
+            subs.append(sub)
+        result = batch.issue_all(subs, max_workers=self._fan_out_workers, client=self._client)
+        if not result.ok():
+            raise result.errors[min(result.errors)]
+        df = result.concat(drop_duplicates=False)
+        # The same policy can be returned by several of the requests: merge by policy ID, or by content without one.
+        return df.drop_duplicates(subset="policy_id" if "policy_id" in df.columns else None, ignore_index=True)
+
+    def _traced_get(self, trace, params, headers=None):
+        with trace.span("ttfb"):
+            resp = self._get(params, headers, stream=True)
+        with trace.span("transfer"):
+            resp.content  # read the whole body
+        trace.record_response(resp)
+        return resp
+
+    def _emit(self, trace):
+        if self._instrumentation is not None:
+            self._instrumentation.emit(trace)
+        elif self._client is not None and self._client.instrumentation is not None:
+            self._client.instrumentation.emit(trace)
+        else:
+            instrumentation.DEFAULT_INSTRUMENTATION.emit(trace)
+
     # Helpers for testing
     def set_request(self, r):
         """
@@ -184,3 +434,72 @@ class Request:
         """
         self._api_password = p
 
+    def set_cache(self, c):
+        """
+        Sets the cache responses to this request are served from and stored in. Defaults to the cache of the client of
+        this request, if any; requests are not cached otherwise.
+        :param c: a cache.ResponseCache or cache.MemoryCache, or None for the default
+        :return: none
+        """
+        self._cache = c
+
+    def set_client(self, c):
+        """
+        Sets the client this request is issued through. Sharing one client between requests reuses its pooled
+        connections and retries transient errors. Without a client, each request opens a new connection.
+        :param c: a client.Client, or None to issue the request without one
+        :return: none
+        """
+        self._client = c
+
+    def set_snapshot(self, s):
+        """
+        Sets a snapshot of the database this request is evaluated against instead of the API. The result has the same
+        shape as the one returned by the API for the same filters.
+        :param s: a snapshot.Snapshot or an index.PolicyIndex, or None to issue the request against the API
+        :return: none
+        """
+        self._snapshot = s
+
+    def set_instrumentation(self, i):
+        """
+        Sets the instrumentation receiving the timings and sizes of each call to Request.issue. Defaults to the
+        instrumentation of the client of this request, if any, and otherwise to logging at DEBUG level on the
+        "cpdb_api" logger.
+        :param i: an instrumentation.Instrumentation, or None for the default
+        :return: none
+        """
+        self._instrumentation = i
+
+    def set_fan_out(self, f, max_workers=batch.DEFAULT_MAX_WORKERS):
+        """
+        Sets whether multi-valued filters (several decision dates, sectors, policy instruments or policy types) are
+        split into single-valued sub-requests, one per combination of values, issued concurrently and merged by policy
+        ID. This returns every policy matching any of the values, each once, where the server alone honours only the
+        first decision date and returns duplicates. Disabled by default.
+        :param f: True to enable fanning out
+        :param max_workers: the maximum number of sub-requests in flight at the same time
+        :return: none
+        """
+        self._fan_out = f
+        self._fan_out_workers = max_workers
+
+    def set_result_store(self, s):
+        """
+        Sets the store of recent results this request is answered from, without querying the server, when its filters
+        refine the ones of a result in the store. The result of this request is added to the store. Requests are not
+        answered from previous results by default.
+        :param s: a reuse.ResultStore, or None
+        :return: none
+        """
+        self._result_store = s
+
+    def set_decoder(self, d):
+        """
+        Sets the decoder of the responses to this request. Defaults to the fastest decoder installed, see
+        decode.get_decoder.
+        :param d: a decoder, e.g. decode.get_decoder("json"), or None for the default
+        :return: none
+        """
+        self._decoder = d
+
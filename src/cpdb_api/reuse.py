@@ -0,0 +1,156 @@
+"""Local answers to Requests that refine the filters of a result already held in memory or in a cache."""
+
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from cpdb_api import decode
+from cpdb_api.snapshot import (CONTAINS_PROPERTIES, EXACT_PROPERTIES, FIRST_VALUE_PROPERTIES, Snapshot,
+                               normalize_properties)
+
+DEFAULT_MAX_RESULTS = 32
+
+
+def contains(broad, narrow):
+    """
+    Tells whether every policy matched by the narrow properties is also matched by the broad ones, with the match
+    semantics of the API. This holds when narrow keeps every filter of broad, with the same or fewer countries, the
+    same first decision date, and only values containing one of the values of broad for the other properties.
+    :param broad: the marshalled properties of a Request
+    :param narrow: the marshalled properties of another Request
+    :return: True if the result of broad contains the result of narrow
+    """
+    try:
+        broad = normalize_properties(broad)
+        narrow = normalize_properties(narrow)
+    except ValueError:
+        return False
+    for key, values in broad.items():
+        if key not in narrow:
+            return False
+        if key in EXACT_PROPERTIES:
+            if not {v.lower() for v in narrow[key]} <= {v.lower() for v in values}:
+                return False
+        elif key in FIRST_VALUE_PROPERTIES:
+            if pd.to_numeric(narrow[key][0], errors="coerce") != pd.to_numeric(values[0], errors="coerce"):
+                return False
+        elif key in CONTAINS_PROPERTIES:
+            if not all(any(v.lower() in n.lower() for v in values) for n in narrow[key]):
+                return False
+    return True
+
+
+def _refines(broad, narrow):
+    # The same request is not answered from its own earlier result, but fetched again, so that it is served fresh
+    # through the TTL and revalidation of the cache, if any.
+    return contains(broad, narrow) and not contains(narrow, broad)
+
+
+class _Result:
+
+    def __init__(self, properties, df):
+        self.properties = properties
+        self.data_frame = df
+        self._snapshot = None
+
+    def query(self, properties):
+        # Only prepare the columns for local evaluation once the result is reused.
+        if self._snapshot is None:
+            self._snapshot = Snapshot(self.data_frame)
+        return self._snapshot.query(properties)
+
+
+class ResultStore:
+    """
+    Holds the results of recent Requests in memory (see Request.set_result_store), and answers a later Request whose
+    filters are a strict refinement of one of them, e.g. a sector of a country already fetched, by filtering that
+    result locally instead of querying the server. The filters are evaluated with the same semantics as the API, see
+    snapshot.Snapshot. A request with the same filters as a held result is not answered from it, but issued again.
+    At most max_results results are held; the least recently used are dropped first.
+
+    With a cache, e.g. a cache.ResponseCache, the fresh responses of the cache are considered too.
+
+    served lists the requests answered locally, as dicts with the api_url and properties of the request and the
+    properties of the result it was answered from.
+    """
+
+    def __init__(self, max_results=DEFAULT_MAX_RESULTS, cache=None):
+        """
+        :param max_results: the maximum number of results held in memory
+        :param cache: a cache.BaseCache whose responses may answer requests too, or None
+        """
+        self._max_results = max_results
+        self._cache = cache
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.served = []
+
+    def put(self, api_url, properties, df, credentials=None):
+        """
+        :param api_url: the URL of the API the request was issued against
+        :param properties: the marshalled properties of the request
+        :param df: the result of the request, as returned by Request.issue
+        :param credentials: the (user, password) pair the request authenticated with, or None if it did not. Results
+        only answer requests with the same credentials.
+        :return: none
+        """
+        self._store(self._key(api_url, properties, credentials), _Result(properties, df))
+
+    def _store(self, key, result):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self._max_results:
+                self._results.popitem(last=False)
+
+    def answer(self, api_url, properties, credentials=None):
+        """
+        :param api_url: the URL of the API the request is issued against
+        :param properties: the marshalled properties of the request
+        :param credentials: the (user, password) pair the request authenticates with, or None if it does not
+        :return: the result of the request, computed from a result containing it, or None if no result does
+        """
+        for result in self._containing(api_url, properties, credentials):
+            try:
+                df = result.query(properties)
+            except ValueError:
+                continue  # the result lacks a column the request filters on
+            # The API returns a policy once per value it matches of a multi-valued filter, which a narrower request
+            # does not: keep one row per policy.
+            if "policy_id" in df.columns:
+                df = df.drop_duplicates(subset="policy_id", ignore_index=True)
+            with self._lock:
+                self.served.append(dict(api_url=api_url, properties=properties, source=result.properties))
+            return df
+        return None
+
+    def _containing(self, api_url, properties, credentials):
+        scope = self._key(api_url, {}, credentials)[:2]
+        with self._lock:
+            candidates = [(key, r) for key, r in self._results.items()
+                          if key[:2] == scope and _refines(r.properties, properties)]
+        # The smallest containing result is the cheapest to filter.
+        for key, result in sorted(candidates, key=lambda c: len(c[1].data_frame)):
+            with self._lock:
+                if key in self._results:
+                    self._results.move_to_end(key)
+            yield result
+        if self._cache is None:
+            return
+        for key, broad in self._cache.fresh_properties(api_url, credentials):
+            if not _refines(broad, properties):
+                continue
+            entry = self._cache.get(key)
+            if entry is None:
+                continue
+            result = _Result(broad, pd.DataFrame.from_dict(decode.get_decoder().decode(entry.body)))
+            self._store(self._key(api_url, broad, credentials), result)
+            yield result
+
+    @staticmethod
+    def _key(api_url, properties, credentials):
+        if credentials is not None and credentials[0] == "":
+            credentials = None
+        return api_url, credentials, json.dumps(properties, sort_keys=True, default=str)
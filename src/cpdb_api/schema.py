@@ -0,0 +1,63 @@
+"""Compact, typed representations of policy DataFrames."""
+
+import pandas as pd
+
+# Low-cardinality fields always stored as categoricals.
+CATEGORICAL_COLUMNS = ("country_iso", "policy_status")
+# Fields holding a year, stored as nullable small integers.
+YEAR_COLUMNS = ("decision_date", "start_date", "end_date")
+# Fields holding comma-separated values.
+MULTI_VALUED_COLUMNS = ("sector", "policy_instrument", "policy_type")
+# Other text columns are stored as categoricals when they have at most this many distinct values per row.
+CATEGORY_RATIO = 0.5
+MULTI_VALUED_MODES = ("category", "onehot")
+
+
+def compact_frame(df, multi_valued="category"):
+    """
+    Converts a DataFrame of policies, as returned by the API, to compact column types:
+    - low-cardinality text columns become categoricals;
+    - years become nullable 16-bit integers, missing years becoming <NA>;
+    - multi-valued columns become categoricals of their combinations of values (multi_valued="category"), or are
+      replaced by sparse boolean indicator columns, one per value, named e.g. "sector=Transport"
+      (multi_valued="onehot").
+    :param df: a DataFrame of policies
+    :param multi_valued: how multi-valued columns are represented, one of MULTI_VALUED_MODES
+    :return: a new DataFrame
+    """
+    if multi_valued not in MULTI_VALUED_MODES:
+        raise ValueError("multi_valued must be one of %s, got %r" % (", ".join(MULTI_VALUED_MODES), multi_valued))
+    columns = dict()
+    for name in df.columns:
+        column = df[name]
+        if name in YEAR_COLUMNS:
+            columns[name] = pd.to_numeric(column, errors="coerce").astype("Int16")
+        elif name in MULTI_VALUED_COLUMNS and multi_valued == "onehot":
+            for value_name, indicator in one_hot(column).items():
+                columns[name + "=" + value_name] = indicator
+        elif name in CATEGORICAL_COLUMNS + MULTI_VALUED_COLUMNS or _is_low_cardinality(column):
+            columns[name] = column.astype("category")
+        else:
+            columns[name] = column
+    return pd.DataFrame(columns, index=df.index)
+
+
+def one_hot(column):
+    """
+    :param column: a Series of comma-separated values
+    :return: a DataFrame with one sparse boolean column per distinct value, True on the rows holding the value
+    """
+    values = column.fillna("").astype(str).str.replace(r"\s*,\s*", ",", regex=True).str.strip()
+    dummies = values.str.get_dummies(sep=",")
+    return dummies.astype(pd.SparseDtype(bool, False))
+
+
+def _is_low_cardinality(column):
+    if column.dtype != object and not pd.api.types.is_string_dtype(column.dtype):
+        return False
+    if len(column) == 0:
+        return False
+    try:
+        return column.nunique(dropna=True) <= CATEGORY_RATIO * len(column)
+    except TypeError:  # unhashable values, e.g. lists
+        return False
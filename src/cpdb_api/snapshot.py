@@ -0,0 +1,122 @@
+"""Local evaluation of Requests against a snapshot of the ClimatePolicy DataBase (CPDB)."""
+
+import json
+import re
+
+import pandas as pd
+
+# Columns of the CSV export of the database, and the names the API uses for them.
+EXPORT_COLUMNS = {
+    "Country ISO": "country_iso",
+    "Sector name": "sector",
+    "Type of policy instrument": "policy_instrument",
+    "Policy type": "policy_type",
+    "Implementation state": "policy_status",
+    "Date of decision": "decision_date",
+}
+# Properties matched exactly against any of the requested values.
+EXACT_PROPERTIES = ("country_iso",)
+# Properties matched exactly against the first requested value only, as the API does.
+FIRST_VALUE_PROPERTIES = ("decision_date",)
+# Properties of multi-valued or free text columns, matched case-insensitively if they contain any requested value.
+CONTAINS_PROPERTIES = ("policy_status", "sector", "policy_instrument", "policy_type")
+# Alternative names of properties accepted by the API.
+PROPERTY_ALIASES = {"implement_state": "policy_status"}
+
+
+def split_values(value):
+    """
+    Splits the value of a marshalled property into the individual values it holds.
+    :param value: a comma-separated string, a number, or a list of those
+    :return: a list of non-empty strings
+    """
+    if isinstance(value, (list, tuple)):
+        return [v for item in value for v in split_values(item)]
+    return [v.strip() for v in str(value).split(",") if v.strip() != ""]
+
+
+def normalize_properties(properties):
+    """
+    :param properties: the marshalled properties of a Request
+    :return: a dict mapping the canonical name of each property to the list of its values. Properties without values
+    are dropped.
+    :raises ValueError: if a property cannot be evaluated locally
+    """
+    normalized = dict()
+    for key, value in (properties or dict()).items():
+        key = PROPERTY_ALIASES.get(key, key)
+        if key not in EXACT_PROPERTIES + FIRST_VALUE_PROPERTIES + CONTAINS_PROPERTIES:
+            raise ValueError("property %r cannot be evaluated locally" % key)
+        values = split_values(value)
+        if len(values) > 0:
+            normalized[key] = values
+    return normalized
+
+
+class Snapshot:
+    """
+    A copy of the database held in memory, against which Requests are evaluated locally with the same match
+    semantics as the API (see Request.set_snapshot). A snapshot can be loaded from the CSV export of the database or
+    from a response previously saved with Request.save_json.
+    """
+
+    def __init__(self, df):
+        """
+        :param df: a DataFrame of policies, with the column names used by the API
+        """
+        self._data_frame = df.reset_index(drop=True)
+        # Prepare the columns once, so that each query is a handful of vectorized comparisons.
+        self._columns = dict()
+        for key in EXACT_PROPERTIES + CONTAINS_PROPERTIES:
+            if key in df.columns:
+                self._columns[key] = self._data_frame[key].fillna("").astype(str).str.lower()
+        for key in FIRST_VALUE_PROPERTIES:
+            if key in df.columns:
+                self._columns[key] = pd.to_numeric(self._data_frame[key], errors="coerce")
+
+    @classmethod
+    def from_csv(cls, path):
+        """
+        :param path: the path of a CSV export of the database
+        :return: a Snapshot of the export, with its columns renamed to the ones used by the API
+        """
+        return cls(pd.read_csv(path).rename(columns=EXPORT_COLUMNS))
+
+    @classmethod
+    def from_json(cls, path):
+        """
+        :param path: the path of a response saved with Request.save_json
+        :return: a Snapshot of the response
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(pd.DataFrame.from_dict(json.load(f)))
+
+    @property
+    def data_frame(self):
+        return self._data_frame
+
+    def mask(self, properties):
+        """
+        :param properties: the marshalled properties of a Request
+        :return: a boolean Series selecting the policies of this snapshot matched by the properties
+        """
+        mask = pd.Series(True, index=self._data_frame.index)
+        for key, values in normalize_properties(properties).items():
+            if key not in self._columns:
+                raise ValueError("the snapshot has no column %r" % key)
+            column = self._columns[key]
+            if key in EXACT_PROPERTIES:
+                mask &= column.isin([v.lower() for v in values])
+            elif key in FIRST_VALUE_PROPERTIES:
+                mask &= column == pd.to_numeric(values[0], errors="coerce")
+            else:
+                pattern = "|".join(re.escape(v.lower()) for v in values)
+                mask &= column.str.contains(pattern, regex=True)
+        return mask
+
+    def query(self, properties):
+        """
+        :param properties: the marshalled properties of a Request
+        :return: a DataFrame of the policies matched by the properties, shaped like the result of Request.issue
+        """
+        return self._data_frame[self.mask(properties)].reset_index(drop=True)
@@ -0,0 +1,120 @@
+"""Incremental parsing of the JSON arrays returned by the ClimatePolicy DataBase (CPDB) API."""
+
+import codecs
+import csv
+import gzip
+import io
+import json
+
+DEFAULT_CHUNK_SIZE = 64 * 1024  # bytes
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+
+
+def iter_json_array(chunks):
+    """
+    Parses a JSON array from a sequence of byte chunks, yielding each element as soon as it has been read. Only the
+    element being parsed is held in memory, not the whole document.
+    :param chunks: an iterable of bytes holding a UTF-8 encoded JSON array, e.g. requests.Response.iter_content()
+    :return: a generator of the decoded elements of the array
+    """
+    parser = _ArrayParser()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        yield from parser.feed(decoder.decode(chunk))
+    yield from parser.feed(decoder.decode(b"", final=True), final=True)
+
+
+class _ArrayParser:
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._started = False
+        self._closed = False
+
+    def feed(self, text, final=False):
+        buf = self._buf + text
+        pos = 0
+        while not self._closed:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buf):
+                break
+            if not self._started:
+                if buf[pos] != "[":
+                    raise ValueError("expected a JSON array, got %r" % buf[pos:pos + 20])
+                self._started = True
+                pos += 1
+            elif buf[pos] == ",":
+                pos += 1
+            elif buf[pos] == "]":
+                self._closed = True
+                pos += 1
+            else:
+                try:
+                    obj, end = self._decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break  # the element continues in the next chunk
+                # A number or literal is only complete once a delimiter follows it, e.g. "1." may continue as "1.5".
+                if not final and not isinstance(obj, (dict, list, str)) and \
+                        (end == len(buf) or buf[end] not in _DELIMITERS):
+                    break
+                pos = end
+                yield obj
+        self._buf = buf[pos:]
+        if final and not self._closed:
+            raise ValueError("truncated JSON array")
+
+
+FILE_FORMATS = ("json", "ndjson", "csv")
+COMPRESSIONS = (None, "gzip", "zstd")
+
+
+def open_output(path, compression=None):
+    """
+    :param path: the file to write to
+    :param compression: one of COMPRESSIONS. zstd requires the optional zstandard dependency.
+    :return: a binary file object compressing what is written to it
+    """
+    if compression is None:
+        return open(path, "wb")
+    if compression == "gzip":
+        return gzip.open(path, "wb")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd compression requires zstandard: pip install cpdb-api[zstd]") from e
+        return zstandard.ZstdCompressor().stream_writer(open(path, "wb"), closefd=True)
+    raise ValueError("compression must be one of %s, got %r" % (COMPRESSIONS, compression))
+
+
+def write_records(records, f, format):
+    """
+    Writes policies to a file one at a time, without holding them all in memory.
+    :param records: an iterable of policies, as dicts
+    :param f: a binary file object
+    :param format: ndjson for one JSON object per line, or csv. The CSV columns are the fields of the first policy;
+    fields missing from later policies are left empty and extra fields are dropped.
+    :return: the number of policies written
+    """
+    text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+    n = 0
+    writer = None
+    for record in records:
+        if format == "ndjson":
+            text.write(json.dumps(record, ensure_ascii=False))
+            text.write("\n")
+        else:
+            if writer is None:
+                writer = csv.DictWriter(text, fieldnames=list(record), extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow(record)
+        n += 1
+    # Flush the text layer without closing the underlying file, which belongs to the caller.
+    text.flush()
+    text.detach()
+    return n
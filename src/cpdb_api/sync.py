@@ -0,0 +1,179 @@
+"""Incremental synchronisation of a local copy of the ClimatePolicy DataBase (CPDB)."""
+
+import datetime
+import hashlib
+import json
+import os
+
+from cpdb_api import atomic, batch
+from cpdb_api.request import API_URL, Request
+
+ID_COLUMN = "policy_id"
+DEFAULT_WINDOW = 2  # years
+
+
+class SyncReport:
+    """
+    The policies changed by a synchronisation, as lists of policy IDs.
+    """
+
+    def __init__(self, added=None, changed=None, removed=None):
+        self.added = added or []
+        self.changed = changed or []
+        self.removed = removed or []
+
+    def empty(self):
+        """
+        :return: True if the synchronisation did not change the local copy
+        """
+        return len(self.added) + len(self.changed) + len(self.removed) == 0
+
+    def __repr__(self):
+        return "SyncReport(added=%r, changed=%r, removed=%r)" % (self.added, self.changed, self.removed)
+
+
+def record_hash(record):
+    """
+    :param record: a policy, as a dict
+    :return: a digest of the content of the policy, independent of the order of its fields
+    """
+    return hashlib.sha1(json.dumps(record, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class LocalStore:
+    """
+    A local copy of the database, kept as a JSON file in the format written by Request.save_json, so that it can be
+    loaded with snapshot.Snapshot.from_json.
+
+    LocalStore.sync refreshes the copy without downloading the whole database when it can:
+    - if the server sent an ETag or Last-Modified header on the last full download, the database is revalidated with a
+      conditional GET, and nothing is transferred when it is unchanged;
+    - otherwise only the policies decided in the most recent years are fetched, one request per year, and compared
+      with the local copy.
+    Changes are detected by comparing a hash of each policy. Policies decided outside the window are only refreshed
+    by a full synchronisation, which should be run periodically.
+    """
+
+    def __init__(self, path, api_url=API_URL, api_user="", api_password="", client=None, id_column=ID_COLUMN):
+        """
+        :param path: the path of the JSON file holding the local copy
+        :param api_url: the URL of the API
+        :param api_user: the username used for authenticating to the API
+        :param api_password: the password used for authenticating to the API
+        :param client: the client.Client to issue the requests through, if any
+        :param id_column: the field uniquely identifying a policy
+        """
+        self._path = path
+        self._state_path = path + ".state"
+        self._api_url = api_url
+        self._api_user = api_user
+        self._api_password = api_password
+        self._client = client
+        self._id_column = id_column
+
+    def exists(self):
+        return os.path.exists(self._path)
+
+    def load(self):
+        """
+        :return: the policies of the local copy, as a list of dicts. Empty if the store has never been synchronised.
+        """
+        if not self.exists():
+            return []
+        with open(self._path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def sync(self, window=DEFAULT_WINDOW, full=False):
+        """
+        Brings the local copy up to date with the API, and merges the changes into it.
+        :param window: the number of most recent decision years fetched by an incremental synchronisation
+        :param full: if True, the whole database is fetched and compared with the local copy
+        :return: a SyncReport of the added, changed and removed policies
+        """
+        state = self._load_state()
+        if full or not self.exists() or state.get("etag", "") != "" or state.get("last_modified", "") != "":
+            return self._sync_full(state)
+        return self._sync_window(state, window)
+
+    def _sync_full(self, state):
+        if self.exists():
+            resp = self._new_request().issue_conditional(state.get("etag", ""), state.get("last_modified", ""))
+        else:
+            resp = self._new_request().issue_conditional()
+        if resp.status_code == 304:
+            self._save_state(state)
+            return SyncReport()
+        resp.raise_for_status()  # raise any produced error
+        state = dict(etag=resp.headers.get("ETag", ""), last_modified=resp.headers.get("Last-Modified", ""))
+        report = self._merge(resp.json(), lambda record: True)
+        self._save_state(state)
+        return report
+
+    def _sync_window(self, state, window):
+        this_year = datetime.date.today().year
+        years = [str(year) for year in range(this_year - window + 1, this_year + 1)]
+        reqs = []
+        for year in years:
+            r = self._new_request()
+            r.set_decision_date(year)
+            reqs.append(r)
+        result = batch.issue_all(reqs, client=self._client, as_frame=False)
+        if not result.ok():
+            raise next(iter(result.errors.values()))
+        fetched = [record for records in result.frames for record in records]
+        report = self._merge(fetched, lambda record: str(record.get("decision_date", "")) in years)
+        self._save_state(state)
+        return report
+
+    def _merge(self, fetched, in_scope):
+        """
+        Merges fetched policies into the local copy. Local policies in scope that were not fetched are removed.
+        """
+        local = self.load()
+        ids = set()
+        for record in fetched:
+            if self._id_column not in record:
+                raise ValueError("policy without %r field: %r" % (self._id_column, record))
+            ids.add(record[self._id_column])
+        report = SyncReport()
+        merged = [record for record in local if record[self._id_column] in ids or not in_scope(record)]
+        report.removed = [record[self._id_column] for record in local
+                          if record[self._id_column] not in ids and in_scope(record)]
+        positions = {record[self._id_column]: i for i, record in enumerate(merged)}
+        for record in fetched:
+            policy_id = record[self._id_column]
+            if policy_id not in positions:
+                positions[policy_id] = len(merged)
+                merged.append(record)
+                report.added.append(policy_id)
+            elif record_hash(merged[positions[policy_id]]) != record_hash(record):
+                merged[positions[policy_id]] = record
+                report.changed.append(policy_id)
+        if not report.empty() or not self.exists():
+            self._write(self._path, merged)
+        return report
+
+    def _new_request(self):
+        r = Request(api_url=self._api_url)
+        r.set_api_user(self._api_user)
+        r.set_api_password(self._api_password)
+        r.set_client(self._client)
+        return r
+
+    def _load_state(self):
+        try:
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return dict()
+
+    def _save_state(self, state):
+        state["synced_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        self._write(self._state_path, state)
+
+    @staticmethod
+    def _write(path, data):
+        # Replace the file atomically, so that an interrupted synchronisation never leaves a partial copy behind.
+        with atomic.replacing(path) as tmp:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
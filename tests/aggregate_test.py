@@ -0,0 +1,45 @@
+import unittest
+
+import pandas as pd
+
+from cpdb_api.aggregate import Aggregation
+
+_POLICIES = pd.DataFrame({
+    "policy_id": [1, 2, 3, 4, 5],
+    "country_iso": ["IND", "IND", "DEU", "DEU", "BRA"],
+    "sector": ["General", "Electricity and heat, Transport", "Transport", "General,Transport", None],
+    "policy_status": ["In force", "Planned", "In force", "Ended", "In force"],
+    "decision_date": ["2010", "2012", "2010", "", "2018"],
+})
+
+
+class AggregationTests(unittest.TestCase):
+
+    def setUp(self):
+        self._aggregation = Aggregation(_POLICIES)
+
+    def test_multi_valued_columns_are_split(self):
+        self.assertEqual({"General": 2, "Electricity and heat": 1, "Transport": 3},
+                         self._aggregation.counts("sector").to_dict())
+
+    def test_counts_over_several_dimensions(self):
+        counts = self._aggregation.counts(["country_iso", "decision_date"])
+        self.assertEqual({("IND", 2010): 1, ("IND", 2012): 1, ("DEU", 2010): 1, ("BRA", 2018): 1}, counts.to_dict())
+
+    def test_counts_of_filtered_policies(self):
+        counts = self._aggregation.counts("sector", properties={"policy_status": "in force"})
+        self.assertEqual({"General": 1, "Transport": 1}, counts.to_dict())
+
+    def test_pivot(self):
+        table = self._aggregation.pivot("country_iso", "sector")
+        self.assertEqual(["DEU", "IND"], sorted(table.index))
+        self.assertEqual(2, table.loc["DEU", "Transport"])
+        self.assertEqual(0, table.loc["DEU", "Electricity and heat"])
+
+    def test_unknown_dimension(self):
+        with self.assertRaises(ValueError):
+            self._aggregation.counts("mitigation_area")
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+from cpdb_api import atomic
+
+
+class ReplacingTests(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self._path = os.path.join(self._dir.name, "data.json")
+        with open(self._path, "w") as f:
+            f.write("old")
+
+    def read(self):
+        with open(self._path) as f:
+            return f.read()
+
+    def test_file_is_replaced(self):
+        with atomic.replacing(self._path) as tmp:
+            with open(tmp, "w") as f:
+                f.write("new")
+            self.assertEqual("old", self.read())
+        self.assertEqual("new", self.read())
+        self.assertEqual(["data.json"], os.listdir(self._dir.name))
+
+    def test_file_is_kept_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with atomic.replacing(self._path) as tmp:
+                with open(tmp, "w") as f:
+                    f.write("partial")
+                raise RuntimeError()
+        self.assertEqual("old", self.read())
+        self.assertEqual(["data.json"], os.listdir(self._dir.name))
+
+    def test_concurrent_writers_do_not_share_a_temporary_file(self):
+        with atomic.replacing(self._path) as first, atomic.replacing(self._path) as second:
+            self.assertNotEqual(first, second)
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
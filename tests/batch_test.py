@@ -0,0 +1,57 @@
+import unittest
+
+import local_server
+from cpdb_api import batch, request
+
+_POLICIES = [
+    {"policy_id": 1, "country_iso": "IND", "sector": "General"},
+    {"policy_id": 2, "country_iso": "DEU", "sector": "General"},
+    {"policy_id": 3, "country_iso": "DEU", "sector": "Transport"},
+]
+
+
+class CountryHandler(local_server.Handler):
+    """Serves the policies of the requested country, and a 404 for unknown countries."""
+
+    def do_GET(self):
+        country = self.query().get("country_iso", "")
+        records = [p for p in _POLICIES if country == "" or p["country_iso"] == country]
+        self.reply(200 if records else 404, records)
+
+
+class BatchTests(unittest.TestCase):
+
+    def setUp(self):
+        self._url = local_server.serve(self, CountryHandler)
+
+    def new_request(self, country=""):
+        r = request.Request(api_url=self._url)
+        if country != "":
+            r.set_country(country)
+        return r
+
+    def test_frames_are_returned_in_order(self):
+        result = batch.issue_all([self.new_request("DEU"), self.new_request("IND")], max_workers=2)
+        self.assertTrue(result.ok())
+        self.assertEqual(2, len(result.frames[0]))
+        self.assertEqual("IND", result.frames[1]["country_iso"][0])
+
+    def test_records(self):
+        result = batch.issue_all([self.new_request("DEU"), self.new_request("IND")], as_frame=False)
+        self.assertEqual(["IND"], [record["country_iso"] for record in result.frames[1]])
+
+    def test_errors_are_collected(self):
+        result = batch.issue_all([self.new_request("IND"), self.new_request("XXX")])
+        self.assertFalse(result.ok())
+        self.assertEqual([1], list(result.errors))
+        self.assertIsNone(result.frames[1])
+        self.assertEqual(1, len(result.concat()))
+
+    def test_concat_drops_duplicates(self):
+        result = batch.issue_all([self.new_request(), self.new_request("DEU")])
+        self.assertEqual(3, len(result.concat()))
+        self.assertEqual(5, len(result.concat(drop_duplicates=False)))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,181 @@
+"""
+Benchmarks of the client against a local MockServer: end-to-end Request.issue latency, JSON decode and DataFrame
+construction throughput, and peak resident memory.
+
+Each dataset size is served by a mock server and measured by a client in separate processes, so that the peak memory
+of one measurement does not leak into the next:
+    python tests/benchmark/benchmark_test.py --sizes 10000 100000 1000000 --output bench.json
+Pass --baseline with the output of a previous run to fail when a metric regresses by more than --tolerance.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import unittest
+
+import pandas as pd
+import requests
+
+from cpdb_api import decode, request
+from mock_server import MockServer, synthetic_policies
+
+DEFAULT_SIZES = [10000, 100000]
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.2
+# For each metric, True if higher values are better.
+METRICS = {
+    "issue_seconds": False,
+    "decode_mb_per_second": True,
+    "frame_rows_per_second": True,
+    "peak_rss_mb": False,
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def run_benchmark(url, repeat=DEFAULT_REPEAT):
+    """
+    Measures the client against the API at url, in the current process.
+    Returns a dict of metrics. Times are the best of repeat runs.
+    """
+    baseline_rss = peak_rss_mb()
+    issue_seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(request.Request(api_url=url).issue())
+        issue_seconds.append(time.perf_counter() - start)
+    # The first issue is the high-water mark of memory: later ones free the previous result first.
+    rss = peak_rss_mb() - baseline_rss
+    body = requests.get(url, headers={"Accept-Encoding": "identity"}).content
+    decoder = decode.get_decoder()
+    decode_seconds = []
+    frame_seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = decoder.decode(body)
+        decode_seconds.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        pd.DataFrame.from_dict(records)
+        frame_seconds.append(time.perf_counter() - start)
+    return {
+        "policies": rows,
+        "response_mb": len(body) / 1024 / 1024,
+        "issue_seconds": min(issue_seconds),
+        "decode_mb_per_second": len(body) / 1024 / 1024 / min(decode_seconds),
+        "frame_rows_per_second": rows / min(frame_seconds),
+        "peak_rss_mb": rss,
+    }
+
+
+def benchmark_size(n, repeat=DEFAULT_REPEAT):
+    """
+    Serves n synthetic policies from a mock server subprocess and measures them from a client subprocess.
+    Returns a dict of metrics.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen([sys.executable, os.path.join(here, "mock_server.py"), "--policies", str(n)],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        url = server.stdout.readline().strip()
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--url", url, "--repeat", str(repeat)],
+                             stdout=subprocess.PIPE, text=True, check=True).stdout
+        return json.loads(out)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares results with the results of a previous run.
+    Returns a list of messages, one per metric worse than its baseline by more than tolerance (a fraction).
+    """
+    messages = []
+    previous = {b["policies"]: b for b in baseline}
+    for result in results:
+        if result["policies"] not in previous:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            was, now = previous[result["policies"]][metric], result[metric]
+            worse = now < was * (1 - tolerance) if higher_is_better else now > was * (1 + tolerance)
+            if worse:
+                messages.append("%d policies: %s regressed from %.3f to %.3f" % (result["policies"], metric, was, now))
+    return messages
+
+
+class BenchmarkTests(unittest.TestCase):
+
+    def test_run_benchmark(self):
+        with MockServer(synthetic_policies(1000)) as server:
+            result = run_benchmark(server.url, repeat=1)
+        self.assertEqual(1000, result["policies"])
+        for metric in METRICS:
+            self.assertGreaterEqual(result[metric], 0, metric)
+
+    def test_regressions(self):
+        baseline = [{"policies": 10, "issue_seconds": 1.0, "decode_mb_per_second": 100.0,
+                     "frame_rows_per_second": 1000.0, "peak_rss_mb": 50.0}]
+        results = [dict(baseline[0], issue_seconds=1.1, decode_mb_per_second=50.0)]
+        self.assertEqual(["10 policies: decode_mb_per_second regressed from 100.000 to 50.000"],
+                         regressions(results, baseline))
+
+
+class MockServerTests(unittest.TestCase):
+
+    def setUp(self):
+        self._server = MockServer(synthetic_policies(2000)).start()
+        self.addCleanup(self._server.stop)
+
+    def test_filters(self):
+        r = request.Request(api_url=self._server.url)
+        r.set_country("IND")
+        r.add_sector("Transport")
+        df = r.issue()
+        self.assertGreater(len(df), 0)
+        self.assertEqual({"IND"}, set(df["country_iso"]))
+        self.assertTrue(all("Transport" in s for s in df["sector"]))
+
+    def test_conditional_get(self):
+        resp = requests.get(self._server.url)
+        self.assertEqual("gzip", resp.headers["Content-Encoding"])
+        resp = requests.get(self._server.url, headers={"If-None-Match": resp.headers["ETag"]})
+        self.assertEqual(304, resp.status_code)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the CPDB client against a local mock server.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of policies to serve.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Number of runs per measurement.")
+    parser.add_argument("--output", help="Path to write the results to, as JSON.")
+    parser.add_argument("--baseline", help="Path to the results of a previous run to compare with.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Fraction by which a metric may be worse than its baseline.")
+    parser.add_argument("--url", help=argparse.SUPPRESS)  # set when running as the client subprocess
+    args = parser.parse_args()
+
+    if args.url:
+        print(json.dumps(run_benchmark(args.url, args.repeat)))
+        sys.exit(0)
+
+    results = []
+    for n in args.sizes:
+        result = benchmark_size(n, args.repeat)
+        print(" ".join("%s=%.3f" % (k, v) for k, v in result.items()), flush=True)
+        results.append(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            messages = regressions(results, json.load(f), args.tolerance)
+        for message in messages:
+            print(message)
+        sys.exit(1 if messages else 0)
@@ -0,0 +1,181 @@
+"""
+A local stand-in for the CPDB API serving synthetic policies, for tests and benchmarks that need no credentials.
+
+Run it standalone with:
+    python tests/benchmark/mock_server.py --policies 100000 --port 8000
+"""
+
+import argparse
+import gzip
+import hashlib
+import http.server
+import json
+import random
+import threading
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+
+from cpdb_api.snapshot import Snapshot
+
+COUNTRIES = ["ARG", "AUS", "BRA", "CAN", "CHN", "DEU", "FRA", "GBR", "IDN", "IND", "JPN", "KEN", "KOR", "MEX", "NGA",
+             "RUS", "SAU", "TUR", "USA", "ZAF"]
+SECTORS = ["General", "Electricity and heat", "Coal", "Oil", "Gas", "Renewables", "Industry", "Buildings",
+           "Transport", "Agriculture and forestry", "CCS", "Nuclear"]
+POLICY_INSTRUMENTS = ["Direct investment", "Energy and other taxes", "Fiscal or financial incentives",
+                      "Grid access and priority for renewables", "Institutional creation", "Policy support",
+                      "Strategic planning", "Performance label", "Codes and standards", "Feed-in tariffs or premiums"]
+POLICY_TYPES = ["Energy efficiency", "Energy service demand reduction and resource efficiency", "Non energy use",
+                "Other low carbon technologies and fuel switch", "Renewables", "Unknown"]
+POLICY_STATUSES = ["Draft", "Ended", "In force", "Planned", "Superseded", "Under review", "Unknown"]
+
+
+def synthetic_policies(n, seed=0):
+    """
+    :param n: the number of policies to generate
+    :param seed: the seed of the random generator, so that datasets are reproducible
+    :return: a list of n policies shaped like the records returned by the API
+    """
+    rng = random.Random(seed)
+
+    def some(values, most):
+        return ",".join(rng.sample(values, rng.randint(1, most)))
+
+    policies = []
+    for i in range(n):
+        decision_date = str(rng.randint(1990, 2024)) if rng.random() > 0.05 else ""
+        policies.append({
+            "policy_id": i + 1,
+            "policy_title": "Policy %d on %s" % (i + 1, rng.choice(SECTORS).lower()),
+            "country_iso": rng.choice(COUNTRIES),
+            "policy_status": rng.choice(POLICY_STATUSES),
+            "sector": some(SECTORS, 3),
+            "policy_instrument": some(POLICY_INSTRUMENTS, 2),
+            "policy_type": some(POLICY_TYPES, 2),
+            "decision_date": decision_date,
+            "start_date": decision_date,
+            "end_date": "",
+            "reference": "https://example.org/policies/%d" % (i + 1),
+            "description": " ".join(rng.choice(SECTORS) for _ in range(20)),
+        })
+    return policies
+
+
+class MockServer:
+    """
+    An HTTP server answering GET requests like the CPDB API, over the given policies, with the filter semantics of
+    snapshot.Snapshot. Responses carry an ETag, honour If-None-Match, and are gzipped when compress is True and the
+    client accepts it. Credentials are accepted but not checked.
+
+    Use it as a context manager, or call start and stop.
+    """
+
+    def __init__(self, policies, host="127.0.0.1", port=0, compress=True):
+        self._policies = policies
+        self._snapshot = Snapshot(pd.DataFrame.from_dict(policies))
+        self._compress = compress
+        # Responses are computed once per query, so that repeated requests measure the client rather than the server.
+        self._responses = dict()
+        self._lock = threading.RLock()
+        self.requests = 0
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests += 1
+                query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+                properties = {key: ",".join(values) for key, values in query.items()}
+                gzipped = server._compress and "gzip" in self.headers.get("Accept-Encoding", "")
+                try:
+                    body, etag = server.response(properties, gzipped)
+                except ValueError as e:
+                    self.respond(400, str(e).encode("utf-8"))
+                    return
+                if self.headers.get("If-None-Match") == etag:
+                    self.respond(304, b"", {"ETag": etag})
+                    return
+                headers = {"ETag": etag, "Content-Type": "application/json"}
+                if gzipped:
+                    headers["Content-Encoding"] = "gzip"
+                self.respond(200, body, headers)
+
+            def respond(self, status, body, headers=None):
+                self.send_response(status)
+                for name, value in (headers or dict()).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        :return: the URL of the climate-policies endpoint of this server
+        """
+        host, port = self._server.server_address[:2]
+        return "http://%s:%d/api/v1/climate-policies" % (host, port)
+
+    def body(self, properties):
+        """
+        :param properties: the query parameters of a request
+        :return: the JSON body of the response to the request, as bytes
+        """
+        return self.response(properties)[0]
+
+    def response(self, properties, gzipped=False):
+        """
+        :param properties: the query parameters of a request
+        :param gzipped: if True, the body is gzip-compressed
+        :return: the body of the response to the request, as bytes, and its ETag
+        """
+        key = (json.dumps(properties, sort_keys=True), gzipped)
+        with self._lock:
+            if key not in self._responses:
+                if gzipped:
+                    body, etag = self.response(properties)
+                    self._responses[key] = (gzip.compress(body, compresslevel=1), etag)
+                else:
+                    positions = np.flatnonzero(self._snapshot.mask(properties).to_numpy())
+                    body = json.dumps([self._policies[i] for i in positions]).encode("utf-8")
+                    self._responses[key] = (body, '"%s"' % hashlib.sha1(body).hexdigest())
+            return self._responses[key]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve synthetic CPDB policies on a local stand-in of the API.")
+    parser.add_argument("-n", "--policies", type=int, default=10000, help="Number of synthetic policies to serve.")
+    parser.add_argument("-p", "--port", type=int, default=0, help="Port to listen on. A free port is picked if 0.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic dataset.")
+    parser.add_argument("--no_compress", action="store_true", help="Never gzip responses.")
+    args = parser.parse_args()
+    server = MockServer(synthetic_policies(args.policies, args.seed), port=args.port, compress=not args.no_compress)
+    # The first line of output is the URL, for scripts starting the server in a subprocess.
+    print(server.url, flush=True)
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
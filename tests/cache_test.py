@@ -0,0 +1,179 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import local_server
+from cpdb_api import request
+from cpdb_api.cache import BaseCache, MemoryCache, ResponseCache
+from cpdb_api.client import Client
+from cpdb_api.instrumentation import Instrumentation
+
+_API_URL = "http://cpdb.test/api/v1/climate-policies"
+
+
+def fake_response(records, status_code=200, headers=None):
+    resp = mock.Mock()
+    resp.status_code = status_code
+    resp.content = json.dumps(records).encode("utf-8")
+    resp.headers = headers or dict()
+    resp.json.return_value = records
+    return resp
+
+
+class ResponseCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def new_request(self, cache):
+        r = request.Request(api_url=_API_URL)
+        r.set_country("IND")
+        r.set_cache(cache)
+        return r
+
+    def test_second_issue_is_served_from_disk(self):
+        c = ResponseCache(self._dir.name)
+        records = [{"country_iso": "IND", "decision_date": "2018"}]
+        with mock.patch("requests.get", return_value=fake_response(records)) as get:
+            self.new_request(c).issue()
+            df = self.new_request(c).issue()
+        self.assertEqual(1, get.call_count)
+        self.assertEqual("IND", df["country_iso"][0])
+        self.assertEqual(dict(hits=1, misses=1, revalidations=0), c.stats())
+
+    def test_key_depends_on_url_and_properties(self):
+        k = ResponseCache.key(_API_URL, {"country_iso": "IND"})
+        self.assertEqual(k, ResponseCache.key(_API_URL, {"country_iso": "IND"}))
+        self.assertNotEqual(k, ResponseCache.key(_API_URL, {"country_iso": "DEU"}))
+        self.assertNotEqual(k, ResponseCache.key("http://other.test", {"country_iso": "IND"}))
+        self.assertEqual(k, ResponseCache.key(_API_URL, {"country_iso": "IND"}, ("", "")))
+        self.assertNotEqual(k, ResponseCache.key(_API_URL, {"country_iso": "IND"}, ("user", "secret")))
+        self.assertNotIn("secret", ResponseCache.key(_API_URL, {"country_iso": "IND"}, ("user", "secret")))
+
+    def test_users_are_not_served_each_others_responses(self):
+        c = ResponseCache(self._dir.name)
+        with mock.patch("requests.get", return_value=fake_response([{"country_iso": "IND"}])) as get:
+            for user in ("alice", "bob", "alice"):
+                r = self.new_request(c)
+                r.set_api_user(user)
+                r.set_api_password("secret")
+                r.issue()
+            with Client("bob", "secret") as client:
+                r = self.new_request(c)
+                r.set_client(client)
+                r.issue()
+        self.assertEqual(2, get.call_count)
+        self.assertEqual(dict(hits=2, misses=2, revalidations=0), c.stats())
+
+    def test_stale_entry_is_revalidated(self):
+        c = ResponseCache(self._dir.name, ttl=0)
+        records = [{"country_iso": "IND"}]
+        first = fake_response(records, headers={"ETag": '"v1"'})
+        not_modified = fake_response([], status_code=304)
+        with mock.patch("requests.get", side_effect=[first, not_modified]) as get:
+            self.new_request(c).issue()
+            df = self.new_request(c).issue()
+        self.assertEqual({"If-None-Match": '"v1"'}, get.call_args.kwargs["headers"])
+        self.assertEqual(1, len(df))
+        self.assertEqual(dict(hits=0, misses=1, revalidations=1), c.stats())
+
+    def test_entry_evicted_while_read_is_returned(self):
+        c = ResponseCache(self._dir.name)
+        c.put("a", b"0123456789")
+        with mock.patch("os.utime", side_effect=FileNotFoundError):
+            self.assertEqual(b"0123456789", c.get("a").body)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        c = ResponseCache(self._dir.name, max_bytes=20)
+        c.put("a", b"0123456789")
+        time.sleep(0.01)
+        c.put("b", b"0123456789")
+        time.sleep(0.01)
+        c.get("a")
+        c.put("c", b"0123456789")
+        self.assertIsNotNone(c.get("a"))
+        self.assertIsNone(c.get("b"))
+        self.assertIsNotNone(c.get("c"))
+
+
+    def test_fresh_properties_are_indexed_in_memory(self):
+        ResponseCache(self._dir.name).put(ResponseCache.key(_API_URL, {"country_iso": "IND"}), b"[]",
+                                          properties={"country_iso": "IND"})
+        c = ResponseCache(self._dir.name)
+        with mock.patch("os.listdir", wraps=os.listdir) as listdir:
+            self.assertEqual([{"country_iso": "IND"}], [p for _, p in c.fresh_properties(_API_URL)])
+            self.assertEqual(1, listdir.call_count)
+            key = ResponseCache.key(_API_URL, {"country_iso": "DEU"})
+            c.put(key, b"[]", properties={"country_iso": "DEU"})
+            listdir.reset_mock()
+            self.assertEqual(2, len(c.fresh_properties(_API_URL)))
+            c.remove(key)
+            self.assertEqual([{"country_iso": "IND"}], [p for _, p in c.fresh_properties(_API_URL)])
+            self.assertEqual(0, listdir.call_count)
+        self.assertEqual([], ResponseCache(self._dir.name, ttl=0).fresh_properties(_API_URL))
+
+
+class ConditionalHandler(local_server.Handler):
+    """Serves a gzipped body with an ETag, and a 304 when the client already holds it."""
+
+    body = json.dumps([{"policy_id": i, "country_iso": "IND"} for i in range(200)]).encode("utf-8")
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.reply(304, headers={"ETag": '"v1"'})
+        elif "gzip" in self.headers.get("Accept-Encoding", ""):
+            self.reply(body=gzip.compress(self.body), headers={"ETag": '"v1"', "Content-Encoding": "gzip"})
+        else:
+            self.reply(body=self.body, headers={"ETag": '"v1"'})
+
+
+class MemoryCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self._url = local_server.serve(self, ConditionalHandler)
+
+    def test_unchanged_results_are_revalidated(self):
+        traces = []
+        with Client(cache=MemoryCache(), instrumentation=Instrumentation(traces.append)) as c:
+            for _ in range(2):
+                r = request.Request(api_url=self._url)
+                r.set_client(c)
+                self.assertEqual(200, len(r.issue()))
+            self.assertEqual(dict(hits=0, misses=1, revalidations=1), c.cache.stats())
+        self.assertEqual(["miss", "revalidated"], [t["cache"] for t in traces])
+        # The body is sent gzipped, then not at all.
+        self.assertLess(traces[0]["bytes_received"], traces[0]["bytes_decoded"])
+        self.assertEqual(0, traces[1]["bytes_received"])
+
+    def test_least_recently_used_entry_is_evicted(self):
+        c = MemoryCache(max_bytes=20)
+        c.put("a", b"0123456789")
+        c.put("b", b"0123456789")
+        c.get("a")
+        c.put("c", b"0123456789")
+        self.assertIsNotNone(c.get("a"))
+        self.assertIsNone(c.get("b"))
+
+    def test_fresh_properties_and_clear(self):
+        c = MemoryCache(ttl=60)
+        self.assertIsInstance(c, BaseCache)
+        self.assertNotIsInstance(c, ResponseCache)
+        key = c.key(_API_URL, {"country_iso": "IND"})
+        with mock.patch("requests.get", return_value=fake_response([{"country_iso": "IND"}])):
+            r = request.Request(api_url=_API_URL)
+            r.set_country("IND")
+            r.set_cache(c)
+            r.issue()
+        self.assertEqual([(key, {"country_iso": "IND"})], c.fresh_properties(_API_URL))
+        c.clear()
+        self.assertEqual([], c.fresh_properties(_API_URL))
+        self.assertEqual(dict(hits=0, misses=0, revalidations=0), c.stats())
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
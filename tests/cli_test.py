@@ -0,0 +1,101 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+import pyarrow.dataset
+import pyarrow.parquet
+
+import local_server
+from cpdb_api import cli
+from cpdb_api.client import Client
+
+_POLICIES = [
+    {"policy_id": 1, "country_iso": "IND", "decision_date": "2010", "end_date": "2020"},
+    {"policy_id": 2, "country_iso": "IND", "decision_date": "2012", "end_date": None},
+    {"policy_id": 3, "country_iso": "DEU", "decision_date": "2010", "end_date": None},
+]
+
+
+class FlakyHandler(local_server.Handler):
+    """Serves the policies of the requested country or year, failing the first request for DEU."""
+
+    failed = False
+
+    def do_GET(self):
+        query = self.query()
+        country, year = query.get("country_iso", ""), query.get("decision_date", "")
+        if country == "DEU" and not FlakyHandler.failed:
+            FlakyHandler.failed = True
+            self.reply(500)
+        else:
+            self.reply(body=[p for p in _POLICIES
+                             if country in ("", p["country_iso"]) and year in ("", p["decision_date"])])
+
+
+class ExportTests(unittest.TestCase):
+
+    def setUp(self):
+        FlakyHandler.failed = False
+        self._url = local_server.serve(self, FlakyHandler)
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def test_shard_values(self):
+        self.assertEqual(["IND", "DEU"], cli.shard_values("country_iso", ["ind", "DEU", "IND"]))
+        self.assertEqual(["2010", "2011", "2012", "2015"], cli.shard_values("decision_date", ["2010-2012", "2015"]))
+        with self.assertRaises(ValueError):
+            cli.shard_values("sector", ["Transport"])
+        for value in ("abc", "2010-", "2010-abc"):
+            with self.assertRaises(ValueError):
+                cli.shard_values("decision_date", [value])
+
+    def test_failed_shards_are_retried(self):
+        with Client(retries=0) as client:
+            exported, errors = cli.export(self._dir.name, "country_iso", ["IND", "DEU", "BRA"], api_url=self._url,
+                                          client=client, retry_delay=0)
+        self.assertEqual({"IND": 2, "DEU": 1, "BRA": 0}, exported)
+        self.assertEqual({}, errors)
+        self.assertEqual(["country_iso=DEU", "country_iso=IND"], sorted(os.listdir(self._dir.name)))
+        dataset = pyarrow.dataset.dataset(self._dir.name, format="parquet", partitioning="hive")
+        table = dataset.to_table(filter=pyarrow.dataset.field("country_iso") == "IND")
+        self.assertEqual([1, 2], sorted(table.column("policy_id").to_pylist()))
+
+    def test_shards_share_one_schema(self):
+        with Client(retries=0) as client:
+            cli.export(self._dir.name, "country_iso", ["IND", "DEU"], api_url=self._url, client=client, retry_delay=0)
+        # DEU has no end date, which would be written as a null column that cannot be read along the strings of IND
+        table = pyarrow.parquet.read_table(self._dir.name)
+        self.assertEqual(pyarrow.string(), table.schema.field("end_date").type)
+        self.assertEqual(["2020", None, None], table.sort_by("policy_id").column("end_date").to_pylist())
+
+    def test_empty_shards_remove_earlier_partitions(self):
+        stale = cli.partition_path(self._dir.name, "country_iso", "BRA")
+        cli._write(pd.DataFrame({"policy_id": [4]}), stale, "zstd")
+        with Client(retries=0) as client:
+            exported, _ = cli.export(self._dir.name, "country_iso", ["BRA"], api_url=self._url, client=client)
+        self.assertEqual({"BRA": 0}, exported)
+        self.assertFalse(os.path.exists(stale))
+
+    def test_failures_are_reported(self):
+        with Client(retries=0) as client:
+            exported, errors = cli.export(self._dir.name, "country_iso", ["DEU"], api_url=self._url, client=client,
+                                          rounds=1)
+        self.assertEqual({}, exported)
+        self.assertEqual(["DEU"], list(errors))
+
+    def test_main(self):
+        self.assertEqual(0, cli.main(["export", self._dir.name, "--by", "decision_date", "--values", "2010-2011",
+                                      "--api_url", self._url]))
+        self.assertTrue(os.path.exists(cli.partition_path(self._dir.name, "decision_date", "2010")))
+
+    def test_main_rejects_invalid_years(self):
+        with mock.patch("sys.stderr", new_callable=io.StringIO) as stderr, self.assertRaises(SystemExit):
+            cli.main(["export", self._dir.name, "--by", "decision_date", "--values", "abc", "--api_url", self._url])
+        self.assertIn("'abc'", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
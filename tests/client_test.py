@@ -0,0 +1,56 @@
+import unittest
+
+import local_server
+from cpdb_api import request
+from cpdb_api.client import Client
+
+
+class FlakyHandler(local_server.Handler):
+    """Fails the first `failures` requests with a 503, then serves a single record."""
+
+    failures = 0
+    calls = 0
+
+    def do_GET(self):
+        FlakyHandler.calls += 1
+        if FlakyHandler.calls <= FlakyHandler.failures:
+            self.reply(503)
+        else:
+            self.reply(body=[{"country_iso": "IND", "user_agent": self.headers.get("User-Agent")}])
+
+
+class ClientTests(unittest.TestCase):
+
+    def setUp(self):
+        FlakyHandler.calls = 0
+        self._url = local_server.serve(self, FlakyHandler)
+
+    def new_request(self, client):
+        r = request.Request(api_url=self._url)
+        r.set_client(client)
+        return r
+
+    def test_transient_errors_are_retried(self):
+        FlakyHandler.failures = 2
+        with Client(retries=3, backoff_factor=0) as c:
+            df = self.new_request(c).issue()
+        self.assertEqual(3, FlakyHandler.calls)
+        self.assertEqual("IND", df["country_iso"][0])
+
+    def test_exhausted_retries_raise(self):
+        FlakyHandler.failures = 5
+        with Client(retries=1, backoff_factor=0) as c:
+            with self.assertRaises(Exception):
+                self.new_request(c).issue()
+        self.assertEqual(2, FlakyHandler.calls)
+
+    def test_default_headers_are_sent(self):
+        FlakyHandler.failures = 0
+        with Client(headers={"User-Agent": "cpdb-test"}) as c:
+            df = self.new_request(c).issue()
+            df = self.new_request(c).issue()
+        self.assertEqual("cpdb-test", df["user_agent"][0])
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from cpdb_api import columnar, request
+from cpdb_api.snapshot import Snapshot
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+_POLICIES = pd.DataFrame({
+    "policy_id": [1, 2, 3],
+    "country_iso": ["IND", "DEU", "BRA"],
+    "sector": ["General", "Transport,Coal", None],
+    "decision_date": ["2010", "2012", ""],
+})
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class ColumnarTests(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self._request = request.Request()
+        self._request.set_snapshot(Snapshot(_POLICIES))
+        self._request.issue()
+
+    def test_parquet_round_trip(self):
+        path = os.path.join(self._dir.name, "cpdb.parquet")
+        self._request.save_parquet(path)
+        self.assertTrue(columnar.load_parquet(path).equals(_POLICIES))
+
+    def test_feather_round_trip(self):
+        for compression in ("zstd", "uncompressed"):
+            path = os.path.join(self._dir.name, "cpdb-%s.feather" % compression)
+            self._request.save_feather(path, compression=compression)
+            self.assertTrue(columnar.load_feather(path).equals(_POLICIES), compression)
+
+    def test_load_selected_columns(self):
+        path = os.path.join(self._dir.name, "cpdb.feather")
+        self._request.save_feather(path)
+        df = columnar.load_feather(path, columns=["country_iso"])
+        self.assertEqual(["country_iso"], list(df.columns))
+        path = os.path.join(self._dir.name, "cpdb.parquet")
+        self._request.save_parquet(path)
+        df = columnar.load_parquet(path, columns=["policy_id", "sector"])
+        self.assertEqual(["policy_id", "sector"], list(df.columns))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
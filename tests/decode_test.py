@@ -0,0 +1,55 @@
+import json
+import unittest
+from unittest import mock
+
+from cpdb_api import decode, request
+
+_BODY = json.dumps([{"policy_id": 1, "policy_title": "Energiewende", "sector": "Energy"}]).encode("utf-8")
+
+
+class FailingDecoder:
+    """A decoder whose backend is never installed."""
+
+    name = "failing"
+
+    def __init__(self):
+        raise ImportError("not installed")
+
+
+class DecodeTests(unittest.TestCase):
+
+    def tearDown(self):
+        decode.DECODERS.pop(FailingDecoder.name, None)
+        decode._default = None
+
+    def test_decoders_agree(self):
+        for name in decode.DECODERS:
+            try:
+                decoder = decode.get_decoder(name)
+            except ImportError:
+                continue
+            self.assertEqual(json.loads(_BODY), decoder.decode(_BODY), name)
+
+    def test_default_skips_missing_backends(self):
+        decode.register_decoder(FailingDecoder, preferred=True)
+        self.assertNotEqual("failing", decode.get_decoder().name)
+        with self.assertRaises(ImportError):
+            decode.get_decoder("failing")
+
+    def test_unknown_decoder(self):
+        with self.assertRaises(ValueError):
+            decode.get_decoder("yaml")
+
+    def test_request_uses_decoder(self):
+        resp = mock.Mock(content=_BODY, status_code=200)
+        decoder = mock.Mock(wraps=decode.JsonDecoder())
+        r = request.Request()
+        r.set_decoder(decoder)
+        with mock.patch("requests.get", return_value=resp):
+            df = r.issue()
+        decoder.decode.assert_called_once_with(_BODY)
+        self.assertEqual(["Energiewende"], list(df["policy_title"]))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,83 @@
+import unittest
+
+import local_server
+from cpdb_api import request
+
+_POLICIES = [
+    {"policy_id": 1, "decision_date": "2010", "sector": "Energy,Transport"},
+    {"policy_id": 2, "decision_date": "2012", "sector": "Transport"},
+    {"policy_id": 3, "decision_date": "2012", "sector": "Buildings"},
+    {"policy_id": 4, "decision_date": "2014", "sector": "Energy"},
+]
+
+
+class FirstValueHandler(local_server.Handler):
+    """Like the API, honours only the first decision date and returns a policy once per matching sector."""
+
+    queries = []
+    without_ids = False
+
+    def do_GET(self):
+        query = self.query()
+        FirstValueHandler.queries.append(query)
+        records = []
+        for p in _POLICIES:
+            if "decision_date" in query and p["decision_date"] != query["decision_date"].split(",")[0]:
+                continue
+            sectors = query["sector"].split(",") if "sector" in query else [None]
+            records += [p for s in sectors if s is None or s in p["sector"].split(",")]
+        if FirstValueHandler.without_ids:
+            records = [{k: v for k, v in p.items() if k != "policy_id"} for p in records]
+        self.reply(body=records)
+
+
+class FanOutTests(unittest.TestCase):
+
+    def setUp(self):
+        FirstValueHandler.queries = []
+        FirstValueHandler.without_ids = False
+        self._url = local_server.serve(self, FirstValueHandler)
+
+    def test_fan_out(self):
+        self.assertEqual([{"country_iso": "IND", "decision_date": "2010", "sector": "Energy"},
+                          {"country_iso": "IND", "decision_date": "2010", "sector": "Transport"},
+                          {"country_iso": "IND", "decision_date": "2012", "sector": "Energy"},
+                          {"country_iso": "IND", "decision_date": "2012", "sector": "Transport"}],
+                         request.fan_out({"country_iso": "IND", "decision_date": "2010,2012",
+                                          "sector": "Energy,Transport"}))
+        self.assertEqual([{"decision_date": "2010"}], request.fan_out({"decision_date": 2010}))
+
+    def test_without_fan_out_only_the_first_year_is_honoured(self):
+        r = request.Request(api_url=self._url)
+        r.set_decision_date([2010, 2012])
+        self.assertEqual([1], list(r.issue()["policy_id"]))
+
+    def test_union_of_years_and_sectors(self):
+        r = request.Request(api_url=self._url)
+        r.set_fan_out(True)
+        r.set_decision_date(range(2010, 2015))
+        r.add_sector(["Energy", "Transport"])
+        df = r.issue()
+        self.assertEqual([1, 2, 4], sorted(df["policy_id"]))
+        self.assertEqual(10, len(FirstValueHandler.queries))
+        self.assertIsNone(r._response)
+
+    def test_policies_without_id_are_merged_by_content(self):
+        FirstValueHandler.without_ids = True
+        r = request.Request(api_url=self._url)
+        r.set_fan_out(True)
+        r.add_sector(["Energy", "Transport"])
+        df = r.issue()
+        self.assertEqual(["2010", "2012", "2014"], sorted(df["decision_date"]))
+        self.assertEqual(2, len(FirstValueHandler.queries))
+
+    def test_single_values_are_not_fanned_out(self):
+        r = request.Request(api_url=self._url)
+        r.set_fan_out(True)
+        r.add_sector("Transport")
+        self.assertEqual([1, 2], sorted(r.issue()["policy_id"]))
+        self.assertEqual(1, len(FirstValueHandler.queries))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,69 @@
+import itertools
+import unittest
+
+import pandas as pd
+
+from cpdb_api import request
+from cpdb_api.index import PolicyIndex
+from cpdb_api.snapshot import Snapshot
+
+_POLICIES = pd.DataFrame({
+    "policy_id": [1, 2, 3, 4, 5],
+    "country_iso": ["IND", "IND", "DEU", "DEU", "BRA"],
+    "sector": ["General", "Electricity and heat,Coal", "Transport", "General,Transport", None],
+    "policy_instrument": ["Direct investment", "Energy and other taxes", "Direct investment",
+                          "Institutional creation", "Policy support"],
+    "policy_type": ["Energy efficiency", "Renewables", "Energy efficiency,Renewables", "Unknown", "Renewables"],
+    "policy_status": ["In force", "Planned", "In force", "Ended", "In force"],
+    "decision_date": ["2010", "2012", "2010", "", "2018"],
+})
+
+
+class PolicyIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self._index = PolicyIndex(_POLICIES)
+
+    def test_matches_snapshot_semantics(self):
+        s = Snapshot(_POLICIES)
+        filters = [
+            dict(),
+            {"country_iso": "DEU"},
+            {"decision_date": "2010,2012"},
+            {"decision_date": 2018},
+            {"policy_status": "in force"},
+            {"sector": "general,coal"},
+            {"sector": "heat"},
+            {"policy_type": "Renewables", "policy_instrument": "Direct investment"},
+            {"country_iso": "IND", "sector": "General", "decision_date": "2010"},
+        ]
+        for properties in filters:
+            want = list(s.query(properties)["policy_id"])
+            got = list(self._index.query(properties)["policy_id"])
+            self.assertEqual(want, got, properties)
+
+    def test_count_and_facets(self):
+        self.assertEqual(3, self._index.count({"policy_status": "In force"}))
+        self.assertEqual({"General": 1, "Transport": 2}, self._index.facets("sector", {"country_iso": "DEU"}))
+        self.assertEqual({"2010": 2, "2012": 1, "2018": 1}, self._index.facets("decision_date"))
+
+    def test_large_index_agrees_with_snapshot(self):
+        countries = ["IND", "DEU", "BRA", "USA"]
+        sectors = ["General", "Transport", "Coal", "Electricity and heat"]
+        rows = []
+        for i, (c, s1, s2) in enumerate(itertools.product(countries, sectors, sectors)):
+            rows.append(dict(policy_id=i, country_iso=c, sector=s1 + "," + s2, decision_date=str(2000 + i % 7)))
+        df = pd.DataFrame(rows * 20)
+        properties = {"country_iso": "USA", "sector": "coal,transport", "decision_date": "2003"}
+        self.assertTrue(PolicyIndex(df).query(properties).equals(Snapshot(df).query(properties)))
+
+    def test_request_against_index(self):
+        r = request.Request()
+        r.set_snapshot(self._index)
+        r.set_country("IND")
+        r.add_sector("Coal")
+        self.assertEqual([2], list(r.issue()["policy_id"]))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
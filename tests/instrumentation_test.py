@@ -0,0 +1,77 @@
+import json
+import logging
+import tempfile
+import unittest
+
+import pandas as pd
+
+import local_server
+from cpdb_api import request
+from cpdb_api.cache import ResponseCache
+from cpdb_api.client import Client
+from cpdb_api.instrumentation import Instrumentation
+from cpdb_api.snapshot import Snapshot
+
+_BODY = json.dumps([{"policy_id": i, "country_iso": "IND"} for i in range(50)]).encode("utf-8")
+
+
+class Handler(local_server.Handler):
+    """Fails the first request with a 503, then serves _BODY."""
+
+    calls = 0
+
+    def do_GET(self):
+        Handler.calls += 1
+        self.reply(*((503, b"") if Handler.calls == 1 else (200, _BODY)))
+
+
+class InstrumentationTests(unittest.TestCase):
+
+    def setUp(self):
+        Handler.calls = 0
+        self._url = local_server.serve(self, Handler)
+        self._traces = []
+
+    def test_phases_sizes_and_retries(self):
+        with Client(backoff_factor=0, instrumentation=Instrumentation(self._traces.append)) as c:
+            r = request.Request(api_url=self._url)
+            r.set_client(c)
+            r.set_country("IND")
+            r.issue()
+        trace = self._traces[0]
+        self.assertEqual({"ttfb", "transfer", "decode", "frame"}, set(trace["spans"]))
+        self.assertEqual({"country_iso": "IND"}, trace["properties"])
+        self.assertEqual((50, len(_BODY), len(_BODY)), (trace["rows"], trace["bytes_received"], trace["bytes_decoded"]))
+        self.assertEqual(1, trace["retries"])
+        self.assertIsNone(trace["cache"])
+
+    def test_cache_hits_are_flagged(self):
+        Handler.calls = 1
+        with tempfile.TemporaryDirectory() as directory:
+            c = ResponseCache(directory)
+            for _ in range(2):
+                r = request.Request(api_url=self._url)
+                r.set_cache(c)
+                r.set_instrumentation(Instrumentation(self._traces.append))
+                r.issue()
+        self.assertEqual(["miss", "hit"], [t["cache"] for t in self._traces])
+        self.assertNotIn("ttfb", self._traces[1]["spans"])
+
+    def test_snapshot_queries_are_traced(self):
+        r = request.Request()
+        r.set_snapshot(Snapshot(pd.DataFrame({"country_iso": ["IND", "DEU"]})))
+        r.set_instrumentation(Instrumentation(self._traces.append))
+        r.issue()
+        self.assertEqual({"query"}, set(self._traces[0]["spans"]))
+        self.assertEqual(2, self._traces[0]["rows"])
+
+    def test_logging(self):
+        Handler.calls = 1
+        with self.assertLogs("cpdb_api", level=logging.DEBUG) as logs:
+            request.Request(api_url=self._url).issue()
+        self.assertIn("50 rows", logs.output[0])
+        self.assertEqual(50, logs.records[0].cpdb_trace["rows"])
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,46 @@
+import json
+import subprocess
+import sys
+import unittest
+
+import local_server
+from cpdb_api import request
+
+_POLICIES = [{"policy_id": 1, "country_iso": "IND"}, {"policy_id": 2, "country_iso": "DEU"}]
+# Issues a request in a fresh interpreter, and prints the records and whether pandas was imported.
+_CLIENT = """
+import json, sys
+from cpdb_api import request
+records = request.Request(api_url=sys.argv[1]).issue(as_frame=False)
+print(json.dumps([records, "pandas" in sys.modules]))
+"""
+
+
+class Handler(local_server.Handler):
+
+    def do_GET(self):
+        self.reply(body=_POLICIES)
+
+
+class LightweightTests(unittest.TestCase):
+
+    def setUp(self):
+        self._url = local_server.serve(self, Handler)
+
+    def test_records_without_pandas(self):
+        out = subprocess.run([sys.executable, "-c", _CLIENT, self._url], stdout=subprocess.PIPE, text=True,
+                             check=True).stdout
+        self.assertEqual([_POLICIES, False], json.loads(out))
+
+    def test_records_are_saved(self):
+        r = request.Request(api_url=self._url)
+        self.assertEqual(_POLICIES, r.issue(as_frame=False))
+        self.assertEqual(_POLICIES, r._response)
+
+    def test_compact_requires_a_frame(self):
+        with self.assertRaises(ValueError):
+            request.Request(api_url=self._url).issue(compact=True, as_frame=False)
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
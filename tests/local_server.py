@@ -0,0 +1,81 @@
+"""A local HTTP server standing in for the CPDB API in the tests of the client."""
+
+import http.server
+import json
+import threading
+import urllib.parse
+
+API_PATH = "/api/v1/climate-policies"
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """
+    The base class of the request handlers of a LocalServer. Subclasses implement do_GET (or do_HEAD) with query and
+    reply.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def query(self):
+        """
+        :return: the query parameters of the request, as a dict of the first value of each
+        """
+        return {k: v[0] for k, v in urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query).items()}
+
+    def reply(self, status=200, body=b"", headers=None):
+        """
+        :param status: the status code of the response
+        :param body: the body of the response, as bytes, or a value sent as JSON, e.g. a list of policies
+        :param headers: a dict of additional headers
+        """
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalServer:
+    """
+    Serves a Handler subclass on an ephemeral port of 127.0.0.1, from a daemon thread.
+    """
+
+    def __init__(self, handler):
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%d%s" % (self._server.server_address[1], API_PATH)
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def serve(test, handler):
+    """
+    Serves handler for the duration of test.
+    :param test: a unittest.TestCase, whose cleanup stops the server
+    :param handler: a Handler subclass
+    :return: the URL of the API served
+    """
+    server = LocalServer(handler).start()
+    test.addCleanup(server.stop)
+    return server.url
@@ -0,0 +1,143 @@
+import collections
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+import quality_test
+from quality_test import (check_url, detect_invalid_urls_from_dataframe, iter_invalid_urls_from_csv, split_urls,
+                          write_csv)
+
+# The local server shared by the tests of the client lives in the parent directory.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import local_server  # noqa: E402
+
+
+class ReferenceHandler(local_server.Handler):
+    """
+    Serves the pages the tests check, counting the requests for each: .../ok answers HEAD and GET, .../no_head
+    answers GET only, and any other page is missing.
+    """
+
+    requests = collections.Counter()
+    lock = threading.Lock()
+
+    def do_HEAD(self):
+        self.count()
+        self.reply(200 if self.path.endswith("/ok") else 405 if self.path.endswith("/no_head") else 404)
+
+    def do_GET(self):
+        self.count()
+        self.reply(200 if self.path.endswith(("/ok", "/no_head")) else 404, b"<html></html>")
+
+    def count(self):
+        with ReferenceHandler.lock:
+            ReferenceHandler.requests[(self.command, self.path.rsplit("/", 1)[-1])] += 1
+
+
+class CheckUrlTests(unittest.TestCase):
+
+    def setUp(self):
+        ReferenceHandler.requests = collections.Counter()
+        self._base = local_server.serve(self, ReferenceHandler)
+
+    def detect(self, references, **kwargs):
+        df = pd.DataFrame({"reference": references})
+        flagged = detect_invalid_urls_from_dataframe(df, max_workers=4, max_per_host=4, min_interval=0, **kwargs)
+        return list(flagged.index)
+
+    def test_head_falls_back_to_get(self):
+        self.assertEqual((False, 200), check_url(self._base + "/ok")[:2])
+        self.assertEqual((False, 200), check_url(self._base + "/no_head")[:2])
+        self.assertEqual(1, ReferenceHandler.requests[("GET", "no_head")])
+        self.assertEqual((True, 404), check_url(self._base + "/missing")[:2])
+        self.assertEqual((True, None), check_url("not a url")[:2])
+
+    def test_cells_with_several_urls(self):
+        ok, missing = self._base + "/ok", self._base + "/missing"
+        self.assertEqual([ok, missing, ok], split_urls(ok + " " + missing + "\n" + ok))
+        self.assertEqual([1], self.detect([ok + "\n" + ok, ok + " " + missing]))
+
+    def test_ignored_urls(self):
+        ok, ignored, missing = self._base + "/ok", self._base + "/ignored", self._base + "/missing"
+        ignored_cell = missing + " " + ignored
+        with mock.patch.object(quality_test, "IGNORED_URLS", [ignored, ignored_cell]):
+            # An ignored url is skipped within any cell, and a whole ignored cell is never flagged.
+            self.assertEqual([2], self.detect([ignored, ok + " " + ignored, ignored + " " + missing, ignored_cell]))
+        self.assertEqual(0, sum(n for (_, page), n in ReferenceHandler.requests.items() if page == "ignored"))
+
+    def test_empty_cells(self):
+        self.assertEqual([0, 1], self.detect([None, ""]))
+        self.assertEqual([], self.detect([None, ""], ignore_empty=True))
+
+    def test_each_distinct_url_is_checked_once(self):
+        ok, no_head = self._base + "/ok", self._base + "/no_head"
+        self.assertEqual([], self.detect([ok, no_head, ok + " " + no_head, ok]))
+        self.assertEqual({("HEAD", "ok"): 1, ("HEAD", "no_head"): 1, ("GET", "no_head"): 1},
+                         dict(ReferenceHandler.requests))
+
+
+class CsvTests(unittest.TestCase):
+
+    def setUp(self):
+        ReferenceHandler.requests = collections.Counter()
+        self._base = local_server.serve(self, ReferenceHandler)
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self._input = os.path.join(self._dir.name, "input.csv")
+        self._output = os.path.join(self._dir.name, "output.csv")
+
+    def write_input(self, references):
+        pd.DataFrame({
+            "Policy ID": range(10, 10 + len(references)),
+            "Policy title": ["title"] * len(references),
+            "reference": references,
+        }).to_csv(self._input, index=False)
+
+    def check(self, chunk_rows=2):
+        return list(iter_invalid_urls_from_csv(self._input, chunk_rows=chunk_rows, max_workers=4, max_per_host=4,
+                                               min_interval=0))
+
+    def test_chunks(self):
+        ok, missing = self._base + "/ok", self._base + "/missing"
+        self.write_input([ok, missing, ok, "", missing])
+        chunks = self.check()
+        self.assertEqual(3, len(chunks))
+        for chunk in chunks:
+            self.assertEqual(["Policy ID", "reference"], list(chunk.columns))
+        flagged = pd.concat(chunks)
+        self.assertEqual([1, 3, 4], list(flagged.index))
+        self.assertEqual([11, 13, 14], list(flagged["Policy ID"]))
+
+    def test_urls_of_earlier_chunks_are_not_checked_again(self):
+        ok, missing = self._base + "/ok", self._base + "/missing"
+        self.write_input([ok, missing, missing + " " + ok, ok])
+        self.check(chunk_rows=1)
+        self.assertEqual({("HEAD", "ok"): 1, ("HEAD", "missing"): 1, ("GET", "missing"): 1},
+                         dict(ReferenceHandler.requests))
+
+    def test_output_has_a_single_header(self):
+        missing = self._base + "/missing"
+        self.write_input([missing] * 5)
+        write_csv(iter_invalid_urls_from_csv(self._input, chunk_rows=2, min_interval=0), self._output)
+        output = pd.read_csv(self._output, index_col=0)
+        self.assertEqual(["Policy ID", "reference"], list(output.columns))
+        self.assertEqual(list(range(5)), list(output.index))
+
+    def test_input_without_rows(self):
+        self.write_input([])
+        chunks = self.check()
+        self.assertEqual([["Policy ID", "reference"]], [list(chunk.columns) for chunk in chunks])
+        self.assertEqual(0, len(pd.concat(chunks)))
+        write_csv(chunks, self._output)
+        self.assertEqual(["Policy ID", "reference"], list(pd.read_csv(self._output, index_col=0).columns))
+        write_csv([], self._output)
+        self.assertEqual(0, os.path.getsize(self._output))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
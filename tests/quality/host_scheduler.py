@@ -0,0 +1,78 @@
+import collections
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+
+DEFAULT_MAX_PER_HOST = 2
+DEFAULT_MIN_INTERVAL = 1.0  # seconds
+
+
+def host_of(url):
+    """
+    Returns the host a url points at, lower-cased. Malformed urls are grouped under the empty host.
+    """
+    try:
+        return (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+class HostScheduler:
+    """
+    Runs a function on many urls concurrently while staying polite to each host: at most max_per_host urls of the
+    same host are in flight at once, and requests to the same host start at least min_interval seconds apart.
+    Hosts are served round-robin, so that while one host is throttled the workers keep busy with the others, instead
+    of blocking on the few hosts that most urls point at.
+    """
+
+    def __init__(self, max_workers, max_per_host=DEFAULT_MAX_PER_HOST, min_interval=DEFAULT_MIN_INTERVAL):
+        self._max_workers = max_workers
+        self._max_per_host = max_per_host
+        self._min_interval = min_interval
+
+    def run(self, fn, urls):
+        """
+        Calls fn(url) for each url of urls.
+        Yields (url, result) pairs as the calls complete. An exception raised by fn is re-raised.
+        """
+        queues = collections.OrderedDict()
+        for url in urls:
+            queues.setdefault(host_of(url), collections.deque()).append(url)
+        in_flight = collections.Counter()
+        next_start = collections.defaultdict(float)
+        running = dict()
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            while queues or running:
+                # Start one url per host that has a free slot, going round the hosts.
+                now = time.monotonic()
+                wake_up = None
+                for host in list(queues):
+                    if len(running) >= self._max_workers:
+                        break
+                    if in_flight[host] >= self._max_per_host:
+                        continue
+                    if next_start[host] > now:
+                        wake_up = next_start[host] if wake_up is None else min(wake_up, next_start[host])
+                        continue
+                    url = queues[host].popleft()
+                    if not queues[host]:
+                        del queues[host]
+                    else:
+                        queues.move_to_end(host)
+                    running[executor.submit(fn, url)] = (host, url)
+                    in_flight[host] += 1
+                    next_start[host] = now + self._min_interval
+                    # Wake up for the next url of this host as soon as the interval allows, not only when a check
+                    # completes, so that up to max_per_host of its urls overlap.
+                    if host in queues and in_flight[host] < self._max_per_host:
+                        wake_up = next_start[host] if wake_up is None else min(wake_up, next_start[host])
+                if not running:
+                    time.sleep(max(wake_up - now, 0))
+                    continue
+                timeout = None if wake_up is None else max(wake_up - now, 0)
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    host, url = running.pop(future)
+                    in_flight[host] -= 1
+                    yield url, future.result()
@@ -0,0 +1,76 @@
+import collections
+import threading
+import time
+import unittest
+
+from host_scheduler import HostScheduler, host_of
+
+
+class Recorder:
+    """Records when each url starts being checked, and how many urls of each host are checked at once."""
+
+    def __init__(self, duration=0.0):
+        self._duration = duration
+        self._lock = threading.Lock()
+        self._in_flight = collections.Counter()
+        self.starts = []
+        self.max_in_flight = collections.Counter()
+
+    def __call__(self, url):
+        host = host_of(url)
+        with self._lock:
+            self.starts.append((time.monotonic(), url))
+            self._in_flight[host] += 1
+            self.max_in_flight[host] = max(self.max_in_flight[host], self._in_flight[host])
+        time.sleep(self._duration)
+        with self._lock:
+            self._in_flight[host] -= 1
+        return url.upper()
+
+    def start_times(self, host):
+        return [t for t, url in self.starts if host_of(url) == host]
+
+
+class HostSchedulerTests(unittest.TestCase):
+
+    def test_host_of(self):
+        self.assertEqual("example.org", host_of("https://Example.org:8080/a"))
+        self.assertEqual("", host_of("not a url"))
+
+    def test_results(self):
+        urls = ["https://a.example/%d" % i for i in range(5)]
+        results = dict(HostScheduler(4, max_per_host=2, min_interval=0).run(Recorder(), urls))
+        self.assertEqual({url: url.upper() for url in urls}, results)
+
+    def test_urls_of_a_host_overlap_up_to_the_cap(self):
+        recorder = Recorder(duration=0.5)
+        urls = ["https://a.example/%d" % i for i in range(4)]
+        start = time.monotonic()
+        list(HostScheduler(8, max_per_host=4, min_interval=0.05).run(recorder, urls))
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(4, recorder.max_in_flight["a.example"])
+
+    def test_per_host_cap(self):
+        recorder = Recorder(duration=0.1)
+        list(HostScheduler(8, max_per_host=2, min_interval=0).run(recorder, ["https://a.example/%d" % i
+                                                                              for i in range(6)]))
+        self.assertEqual(2, recorder.max_in_flight["a.example"])
+
+    def test_min_interval(self):
+        recorder = Recorder()
+        list(HostScheduler(8, max_per_host=4, min_interval=0.1).run(recorder, ["https://a.example/%d" % i
+                                                                                for i in range(3)]))
+        starts = recorder.start_times("a.example")
+        self.assertTrue(all(b - a >= 0.09 for a, b in zip(starts, starts[1:])), starts)
+
+    def test_hosts_are_served_round_robin(self):
+        recorder = Recorder()
+        urls = ["https://a.example/1", "https://a.example/2", "https://a.example/3", "https://b.example/1",
+                "https://c.example/1"]
+        list(HostScheduler(1, max_per_host=1, min_interval=0).run(recorder, urls))
+        self.assertEqual(["https://a.example/1", "https://b.example/1", "https://c.example/1", "https://a.example/2",
+                          "https://a.example/3"], [url for _, url in recorder.starts])
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -1,84 +1,201 @@
 import argparse
+import os
 import pandas as pd
 import requests
+import tempfile
+import time
 import validators
+from collections import namedtuple
 from cpdb_api import request
-from multiprocessing import Process
-from multiprocessing import Manager
+from host_scheduler import DEFAULT_MAX_PER_HOST, DEFAULT_MIN_INTERVAL, HostScheduler
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+from url_store import DEFAULT_HEALTHY_MAX_AGE, UrlStore
 
 
-DEFAULT_TIMEOUT_PER_ROW = 8  # seconds
 DEFAULT_TIMEOUT_PER_URL = 5  # seconds
+DEFAULT_MAX_WORKERS = 32
+DEFAULT_CHUNK_ROWS = 10000
+# Columns identifying a row of the input csv, read along with the reference column when present.
+ID_COLUMNS = ["policy_id", "Policy ID"]
 FAKE_BROWSER_HEADER = 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/56.0.2924.76 Safari/537.36'
 # List of urls that are valid but can be flagged by the test as invalid for whatever reason.
 # For example, some urls are valid but the server doesn't respond.
 # The urls in the list will not be flagged, so the list should be kept to a reasonable size and manually checked regularly.
-# This list can be moved to spreadsheet for easier management.
+# When a url store is used (--store), the list seeds the ignored urls of the store, which can then be managed with
+# --ignore_url.
 IGNORED_URLS = ["http://www.climatechange.gov.au"]
 
+# The result of checking a url: whether it is flagged, the status code (None if the url could not be fetched) and
+# the time the check took, in seconds.
+UrlCheck = namedtuple("UrlCheck", ["flagged", "status", "latency"])
 
-def detect_invalid_urls_from_dataframe(df, ignore_empty=False):
+
+def detect_invalid_urls_from_dataframe(df, ignore_empty=False, max_workers=DEFAULT_MAX_WORKERS, store=None,
+                                       checkpoint=None, max_per_host=DEFAULT_MAX_PER_HOST,
+                                       min_interval=DEFAULT_MIN_INTERVAL):
     """
     Detect invalid urls from a dataframe.
     We assumes the dataframe has a column called "reference" and it contains urls.
     Returns a dataframe contains only rows that have invalid urls.
 
-    When ignore_empty is True,
+    Each distinct url is only checked once, even if it is referenced by several rows, and urls are checked
+    concurrently by max_workers threads. At most max_per_host urls of the same host are checked at once, at least
+    min_interval seconds apart.
+
+    When ignore_empty is True, rows without any url are not flagged.
+
+    When store is a UrlStore, only the urls with a stale result are checked, the results are saved in the store, and
+    the ignored urls are read from the store instead of IGNORED_URLS.
+
+    When checkpoint is a UrlStore (see UrlStore.checkpoint), the urls it holds a result for are not checked again,
+    and new results are saved in it as soon as they are known.
     """
+    ignored_urls = set(IGNORED_URLS) if store is None else store.ignored_urls()
+    references = [split_urls(url_str) for url_str in df["reference"]]
+    urls = set()
+    for url_str, row_urls in zip(df["reference"], references):
+        if url_str not in ignored_urls:
+            urls.update(u for u in row_urls if u not in ignored_urls)
+    url_results = check_urls(urls, max_workers=max_workers, store=store, checkpoint=checkpoint,
+                             max_per_host=max_per_host, min_interval=min_interval)
     # list of booleans indicating if the url for each row is flagged
     urls_flagged = []
-    manager = Manager()
-    result_dict = manager.dict()
-    for index, row in tqdm(df.iterrows()):
-        url = row["reference"]
-        if url == "" and ignore_empty:
+    for url_str, row_urls in zip(df["reference"], references):
+        if len(row_urls) == 0:
+            urls_flagged.append(not ignore_empty)
+        elif url_str in ignored_urls:
+            # Unflag the url if the url is in the ignored list
             urls_flagged.append(False)
-            continue
-        # Unflag the url if the url is in the ignored list
-        if url in IGNORED_URLS:
-            urls_flagged.append(False)
-            continue
-        # start a subprocess to check the url because it can time out
-        p = Process(target=flag_url, args=(url, result_dict))
-        p.start()
-        p.join(timeout=DEFAULT_TIMEOUT_PER_ROW)
-        p.terminate()
-        if url in result_dict:
-            urls_flagged.append(result_dict[url])
         else:
-            # the process cannot determine if the url is valid or not
-            # so we flag the url as invalid
-            urls_flagged.append(True)
+            urls_flagged.append(flag_url(row_urls, url_results, ignored_urls))
+    # A Series, since indexing with an empty list would select no columns instead of no rows
+    return df[pd.Series(urls_flagged, index=df.index, dtype=bool)]
+
+
+def iter_invalid_urls_from_csv(path, ignore_empty=False, chunk_rows=DEFAULT_CHUNK_ROWS, max_workers=DEFAULT_MAX_WORKERS,
+                               store=None, checkpoint=None, max_per_host=DEFAULT_MAX_PER_HOST,
+                               min_interval=DEFAULT_MIN_INTERVAL):
+    """
+    Detect invalid urls from a csv file too large to load at once, see detect_invalid_urls_from_dataframe.
+    Only the reference column and the ID_COLUMNS found in the file are read, chunk_rows rows at a time, so memory use
+    does not depend on the size of the file. The rows keep their position in the file as index.
+    Yields a dataframe of the rows that have invalid urls for each chunk, possibly empty, and at least one dataframe
+    even when the file has no rows.
+
+    Urls referenced by several chunks are only checked once: their results are kept in checkpoint, or in a temporary
+    checkpoint if none is given.
+    """
+    columns = pd.read_csv(path, nrows=0).columns
+    if "reference" not in columns:
+        raise ValueError(
+            "The input csv file should contain a column named `reference`. Found columns: " + ", ".join(columns)
+        )
+    usecols = [c for c in columns if c in ID_COLUMNS] + ["reference"]
+    with tempfile.TemporaryDirectory() as directory:
+        if checkpoint is None:
+            checkpoint = UrlStore.checkpoint(os.path.join(directory, "checkpoint.sqlite"))
+            owned = checkpoint
+        else:
+            owned = None
+        try:
+            empty = True
+            for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunk_rows):
+                empty = False
+                yield detect_invalid_urls_from_dataframe(chunk, ignore_empty=ignore_empty, max_workers=max_workers,
+                                                         store=store, checkpoint=checkpoint,
+                                                         max_per_host=max_per_host, min_interval=min_interval)
+            if empty:
+                yield pd.DataFrame(columns=usecols)
+        finally:
+            if owned is not None:
+                owned.close()
+
 
-    return df[urls_flagged]
+def write_csv(chunks, path):
+    """
+    Write the flagged rows of each chunk to a csv file as soon as the chunk is checked, with the header of the first
+    chunk only. An empty file is written when there are no chunks.
+    """
+    header = True
+    for flagged_rows in chunks:
+        flagged_rows.fillna('').to_csv(path, mode="w" if header else "a", header=header)
+        header = False
+    if header:
+        open(path, "w").close()
+
+
+def split_urls(url_str):
+    """
+    Sometimes a reference cell stores multiple urls separated by newlines or spaces, so we split them.
+    Returns the list of urls of the cell, empty if the cell is empty.
+    """
+    if not isinstance(url_str, str):  # missing cells are read as NaN
+        return []
+    return [url for url in url_str.replace(" ", "\n").split("\n") if url != ""]
+
+
+def flag_url(urls, url_results, ignored_urls=IGNORED_URLS):
+    """
+    Check if a row needs to be flagged, given the results of checking each of its urls.
+    url_results maps each url to True if the url needs to be flagged and False otherwise.
+    Returns True if any url of the row is flagged. Urls in the ignored list are never flagged.
+    """
+    return any(url_results.get(url, True) for url in urls if url not in ignored_urls)
+
+
+def check_urls(urls, max_workers=DEFAULT_MAX_WORKERS, store=None, checkpoint=None,
+               max_per_host=DEFAULT_MAX_PER_HOST, min_interval=DEFAULT_MIN_INTERVAL):
+    """
+    Check urls concurrently, host by host (see HostScheduler).
+    Returns a dict mapping each url to True if the url needs to be flagged and False otherwise.
+    When store or checkpoint is a UrlStore, urls with a fresh result in it are not checked again, and new results
+    are saved in it.
+    """
+    stores = [s for s in (checkpoint, store) if s is not None]
+    url_results = dict()
+    for s in stores:
+        url_results.update(s.fresh_results(u for u in urls if u not in url_results))
+    urls = [url for url in urls if url not in url_results]
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    scheduler = HostScheduler(max_workers, max_per_host=max_per_host, min_interval=min_interval)
+    with session:
+        for url, result in tqdm(scheduler.run(lambda u: check_url(u, session), urls), total=len(urls)):
+            url_results[url] = result.flagged
+            for s in stores:
+                s.record(url, result.flagged, result.status, result.latency)
+    return url_results
 
 
-def flag_url(url_str, result_dict):
+def check_url(url, session=requests):
     """
     Check if url needs to be flagged.
-    Stores the result in result_dict.
-    The key of result_dict is the url and the value is True if the url needs to be flagged and False otherwise.
-    Currently we only flag urls that are invalid.
+    Currently we only flag urls that are malformed, time out or respond with an error status.
+    A HEAD request is tried first, since it does not download the page. Some servers do not support HEAD, so we fall
+    back to a GET, of which only the status is read.
+    Returns an UrlCheck.
     """
-    # sometimes a reference cell stores multiple urls, so we split them by newline
-    urls = url_str.replace(" ", "\n").split("\n")
-    result = False
-    for url in urls:
-        # check if url is mulformed first
-        if not validators.url(url):
-            result_dict[url] = True
-            return
-        try:
-            headers = {'User-Agent': FAKE_BROWSER_HEADER}
-            response = requests.get(url, headers=headers, timeout=DEFAULT_TIMEOUT_PER_URL)
-        except:
-            # if the request times out, we flag the url
-            result_dict[url] = True
-            return
-        # if the status code of any request is not 200, the url row needs to be flagged
-        result = result or response.status_code > 400
-    result_dict[url_str] = result
+    # check if url is mulformed first
+    if not validators.url(url):
+        return UrlCheck(True, None, 0.0)
+    headers = {'User-Agent': FAKE_BROWSER_HEADER}
+    start = time.monotonic()
+    try:
+        response = session.head(url, headers=headers, timeout=DEFAULT_TIMEOUT_PER_URL, allow_redirects=True)
+        if response.status_code <= 400:
+            return UrlCheck(False, response.status_code, time.monotonic() - start)
+    except requests.RequestException:
+        pass
+    try:
+        with session.get(url, headers=headers, timeout=DEFAULT_TIMEOUT_PER_URL, stream=True) as response:
+            # if the status code of the request is not 200, the url needs to be flagged
+            return UrlCheck(response.status_code > 400, response.status_code, time.monotonic() - start)
+    except requests.RequestException:
+        # if the request times out, we flag the url
+        return UrlCheck(True, None, time.monotonic() - start)
 
 
 if __name__ == "__main__":
@@ -102,39 +219,91 @@ if __name__ == "__main__":
         "--output_csv",
         help="Path to the output csv file. If it's not provided, we default to upload data to a google sheet.",
     )
+    parser.add_argument(
+        "-s",
+        "--store",
+        help="Path to a SQLite store of url check results. If it's provided, only urls with a stale result are checked, and the ignored urls are read from the store.",
+    )
+    parser.add_argument(
+        "--max_age_days",
+        type=float,
+        default=DEFAULT_HEALTHY_MAX_AGE / (24 * 60 * 60),
+        help="Number of days after which a healthy url in the store is checked again.",
+    )
+    parser.add_argument(
+        "-c",
+        "--checkpoint",
+        help="Path to a checkpoint file. Url results are saved to it as they are checked, so that an interrupted run started again with the same checkpoint resumes where it stopped. The file is removed once the run completes.",
+    )
+    parser.add_argument(
+        "--max_per_host",
+        type=int,
+        default=DEFAULT_MAX_PER_HOST,
+        help="Maximum number of urls of the same host checked at once.",
+    )
+    parser.add_argument(
+        "--min_interval",
+        type=float,
+        default=DEFAULT_MIN_INTERVAL,
+        help="Minimum number of seconds between two requests to the same host.",
+    )
+    parser.add_argument(
+        "--chunk_rows",
+        type=int,
+        default=DEFAULT_CHUNK_ROWS,
+        help="Number of rows of the input csv file read and checked at a time.",
+    )
+    parser.add_argument(
+        "--ignore_url",
+        action="append",
+        default=[],
+        help="Add a url to the ignored urls of the store. Can be repeated.",
+    )
     # Other potential arguments:
     # 1. ignore_empty: ignore empty urls when flagging rows
-    # 2. pass in the list of ignored urls as a separate list.
-    # 3. change destination of where to upload the flagged urls.
+    # 2. change destination of where to upload the flagged urls.
 
     args = parser.parse_args()
+    store = None
+    if args.store:
+        store = UrlStore(args.store, healthy_max_age=args.max_age_days * 24 * 60 * 60, ignored_urls=IGNORED_URLS)
+        for url in args.ignore_url:
+            store.ignore(url)
+    elif args.ignore_url:
+        parser.error("--ignore_url requires --store")
+    checkpoint = UrlStore.checkpoint(args.checkpoint) if args.checkpoint else None
+
+    if not args.output_csv:
+        import gspread
+        from datetime import datetime
+
     # Load inputs
     if args.input_csv:
+        # The input is read and checked in chunks, so that large files are never fully held in memory.
         print("Read input from local CSV file. Path: " + args.input_csv)
-        df = pd.read_csv(args.input_csv)
-        if "reference" not in df.columns:
-            raise ValueError(
-                "The input csv file should contain a column named `reference`. Found columns: "
-                + df.columns
-            )
+        chunks = iter_invalid_urls_from_csv(args.input_csv, chunk_rows=args.chunk_rows, store=store,
+                                            checkpoint=checkpoint, max_per_host=args.max_per_host,
+                                            min_interval=args.min_interval)
     else:
         print("Download input from cpdb-api.")
         r = request.Request()
         df = r.issue()
         print("Downloaded " + str(df.shape[0]) + " rows from cpdb-api.")
-
-    if not args.output_csv:
-        import gspread
-        from datetime import datetime
-
-    flagged_rows = detect_invalid_urls_from_dataframe(df)
-    flagged_rows = flagged_rows.fillna('')
+        chunks = [detect_invalid_urls_from_dataframe(df, store=store, checkpoint=checkpoint,
+                                                     max_per_host=args.max_per_host,
+                                                     min_interval=args.min_interval)]
 
     # Output results
     if args.output_csv:
         print("Write output to local CSV file. Path: " + args.output_csv)
-        flagged_rows.to_csv(args.output_csv)
+        write_csv(chunks, args.output_csv)
     else:
+        flagged_rows = pd.concat(list(chunks)).fillna('')
+    if checkpoint is not None:
+        checkpoint.close()
+        os.remove(args.checkpoint)
+
+    if not args.output_csv:
         print("Upload output to google sheet.")
         # Flora's test sheet, need to be swapped out to a sheet owned by NewClimate
         # Steps:
@@ -168,7 +337,7 @@ if __name__ == "__main__":
         if worksheet_exists:
             worksheet.clear()
         else:
-            worksheet = sheet.add_worksheet(title=datetime.today().strftime('%Y-%m-%d'), rows=str(df.shape[0] + 10), cols=str(df.shape[1]))
+            worksheet = sheet.add_worksheet(title=datetime.today().strftime('%Y-%m-%d'), rows=str(flagged_rows.shape[0] + 10), cols=str(flagged_rows.shape[1]))
 
         # Convert the DataFrame to a list of lists and upload it to the worksheet
         data = [flagged_rows.columns.values.tolist()] + flagged_rows.values.tolist()
@@ -0,0 +1,110 @@
+import math
+import sqlite3
+import time
+
+
+DEFAULT_HEALTHY_MAX_AGE = 30 * 24 * 60 * 60  # seconds
+DEFAULT_RETRY_DELAY = 24 * 60 * 60  # seconds
+DEFAULT_MAX_RETRY_DELAY = 16 * 24 * 60 * 60  # seconds
+
+
+class UrlStore:
+    """
+    A local SQLite store of url check results, so that a run only rechecks the urls whose result is stale.
+
+    A healthy url is rechecked once its result is older than healthy_max_age. A flagged url is retried on an
+    exponential schedule: after n consecutive failed checks, it is rechecked once retry_delay * 2 ** (n - 1) seconds
+    have passed, capped at max_retry_delay. Until then, its last result is reused.
+
+    The store also holds the list of ignored urls, i.e. urls that are valid but flagged for whatever reason.
+    """
+
+    def __init__(self, path, healthy_max_age=DEFAULT_HEALTHY_MAX_AGE, retry_delay=DEFAULT_RETRY_DELAY,
+                 max_retry_delay=DEFAULT_MAX_RETRY_DELAY, ignored_urls=()):
+        """
+        ignored_urls are added to the ignored urls of the store when it is created.
+        """
+        self._healthy_max_age = healthy_max_age
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+        self._conn = sqlite3.connect(path)
+        with self._conn:
+            exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'urls'").fetchone() is not None
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS urls ("
+                "url TEXT PRIMARY KEY, flagged INTEGER, status INTEGER, latency REAL, checked_at REAL, "
+                "failures INTEGER NOT NULL DEFAULT 0, ignored INTEGER NOT NULL DEFAULT 0)")
+            if not exists:
+                for url in ignored_urls:
+                    self._set_ignored(url, True)
+
+    @classmethod
+    def checkpoint(cls, path):
+        """
+        Returns a store whose results never go stale, to checkpoint the progress of a single run: a run interrupted
+        and started again with the same checkpoint only checks the urls that were not checked yet.
+        """
+        return cls(path, healthy_max_age=math.inf, retry_delay=math.inf, max_retry_delay=math.inf)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def ignored_urls(self):
+        """
+        Returns the set of ignored urls.
+        """
+        return {row[0] for row in self._conn.execute("SELECT url FROM urls WHERE ignored = 1")}
+
+    def ignore(self, url, ignored=True):
+        """
+        Adds url to the ignored urls, or removes it if ignored is False.
+        """
+        with self._conn:
+            self._set_ignored(url, ignored)
+
+    def fresh_results(self, urls, now=None):
+        """
+        Returns a dict mapping each url of urls with a result that does not need to be rechecked yet to True if the
+        url was flagged and False otherwise.
+        """
+        now = time.time() if now is None else now
+        results = dict()
+        for url in urls:
+            row = self._conn.execute(
+                "SELECT flagged, checked_at, failures FROM urls WHERE url = ? AND checked_at IS NOT NULL",
+                (url,)).fetchone()
+            if row is None:
+                continue
+            flagged, checked_at, failures = row
+            if flagged:
+                max_age = min(self._retry_delay * 2 ** max(failures - 1, 0), self._max_retry_delay)
+            else:
+                max_age = self._healthy_max_age
+            if now - checked_at < max_age:
+                results[url] = bool(flagged)
+        return results
+
+    def record(self, url, flagged, status=None, latency=None, checked_at=None):
+        """
+        Stores the result of checking url. status is None if the url could not be fetched.
+        """
+        checked_at = time.time() if checked_at is None else checked_at
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO urls (url, flagged, status, latency, checked_at, failures) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET flagged = excluded.flagged, status = excluded.status, "
+                "latency = excluded.latency, checked_at = excluded.checked_at, "
+                "failures = CASE WHEN excluded.flagged THEN urls.failures + 1 ELSE 0 END",
+                (url, int(flagged), status, latency, checked_at, int(flagged)))
+
+    def _set_ignored(self, url, ignored):
+        self._conn.execute(
+            "INSERT INTO urls (url, ignored) VALUES (?, ?) ON CONFLICT(url) DO UPDATE SET ignored = excluded.ignored",
+            (url, int(ignored)))
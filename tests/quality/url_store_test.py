@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+from url_store import UrlStore
+
+_URL = "https://example.org/policy"
+_DAY = 24 * 60 * 60
+
+
+class UrlStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self._path = os.path.join(self._dir.name, "urls.sqlite")
+
+    def new_store(self, **kwargs):
+        store = UrlStore(self._path, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def is_fresh(self, store, age):
+        return _URL in store.fresh_results([_URL], now=1000 * _DAY + age)
+
+    def record_failures(self, store, times):
+        for _ in range(times):
+            store.record(_URL, True, checked_at=1000 * _DAY)
+
+    def test_healthy_url_is_rechecked_after_max_age(self):
+        store = self.new_store(healthy_max_age=30 * _DAY)
+        store.record(_URL, False, 200, 0.1, checked_at=1000 * _DAY)
+        self.assertEqual({_URL: False}, store.fresh_results([_URL], now=1000 * _DAY + 29 * _DAY))
+        self.assertFalse(self.is_fresh(store, 30 * _DAY))
+
+    def test_retry_delay_doubles_after_each_failure(self):
+        store = self.new_store(retry_delay=_DAY, max_retry_delay=100 * _DAY)
+        for failures, delay in [(1, 1), (2, 2), (3, 4)]:
+            self.record_failures(store, 1)
+            self.assertTrue(self.is_fresh(store, delay * _DAY - 1), failures)
+            self.assertFalse(self.is_fresh(store, delay * _DAY), failures)
+
+    def test_retry_delay_is_capped(self):
+        store = self.new_store(retry_delay=_DAY, max_retry_delay=3 * _DAY)
+        self.record_failures(store, 5)  # 16 days without the cap
+        self.assertTrue(self.is_fresh(store, 3 * _DAY - 1))
+        self.assertFalse(self.is_fresh(store, 3 * _DAY))
+
+    def test_success_resets_the_retry_delay(self):
+        store = self.new_store(retry_delay=_DAY, healthy_max_age=30 * _DAY)
+        self.record_failures(store, 3)
+        store.record(_URL, False, 200, checked_at=1000 * _DAY)
+        self.assertTrue(self.is_fresh(store, 10 * _DAY))
+        self.record_failures(store, 1)
+        self.assertFalse(self.is_fresh(store, _DAY))
+
+    def test_ignored_urls_are_seeded_on_creation_only(self):
+        store = self.new_store(ignored_urls=["https://a.example"])
+        store.ignore("https://a.example", False)
+        store.ignore("https://b.example")
+        store.close()
+        store = self.new_store(ignored_urls=["https://a.example", "https://c.example"])
+        self.assertEqual({"https://b.example"}, store.ignored_urls())
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
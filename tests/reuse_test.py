@@ -0,0 +1,153 @@
+import tempfile
+import unittest
+
+import local_server
+from cpdb_api import request
+from cpdb_api.cache import ResponseCache
+from cpdb_api.instrumentation import Instrumentation
+from cpdb_api.reuse import ResultStore, contains
+
+_POLICIES = [
+    {"policy_id": 1, "country_iso": "IND", "sector": "Electricity and heat", "policy_status": "In force",
+     "decision_date": "2010"},
+    {"policy_id": 2, "country_iso": "IND", "sector": "Transport", "policy_status": "Planned",
+     "decision_date": "2012"},
+    {"policy_id": 3, "country_iso": "DEU", "sector": "Transport", "policy_status": "In force",
+     "decision_date": "2010"},
+]
+_GENERAL_POLICIES = [
+    {"policy_id": 1, "country_iso": "IND", "sector": "General,Transport"},
+    {"policy_id": 2, "country_iso": "DEU", "sector": "General"},
+]
+
+
+class CountryHandler(local_server.Handler):
+    """Serves the policies of the requested country, counting the requests."""
+
+    calls = 0
+
+    def do_GET(self):
+        CountryHandler.calls += 1
+        country = self.query().get("country_iso", "")
+        self.reply(body=[p for p in _POLICIES if country in ("", p["country_iso"])])
+
+
+class SectorHandler(local_server.Handler):
+    """Like the API, returns a policy once per requested sector it matches."""
+
+    calls = 0
+
+    def do_GET(self):
+        SectorHandler.calls += 1
+        query = self.query()
+        sectors = query["sector"].split(",") if "sector" in query else [None]
+        self.reply(body=[p for p in _GENERAL_POLICIES for s in sectors
+                         if query.get("country_iso", "") in ("", p["country_iso"])
+                         and (s is None or s in p["sector"].split(","))])
+
+
+class ContainsTests(unittest.TestCase):
+
+    def test_refinements(self):
+        self.assertTrue(contains({}, {"country_iso": "IND", "sector": "Transport"}))
+        self.assertTrue(contains({"country_iso": "IND,DEU"}, {"country_iso": "ind"}))
+        self.assertTrue(contains({"sector": "transport"}, {"sector": "Transport", "decision_date": 2010}))
+        self.assertTrue(contains({"decision_date": "2010,2012"}, {"decision_date": 2010}))
+        self.assertTrue(contains({"implement_state": "force"}, {"policy_status": "In force"}))
+
+    def test_non_refinements(self):
+        self.assertFalse(contains({"country_iso": "IND"}, {}))
+        self.assertFalse(contains({"country_iso": "IND"}, {"country_iso": "IND,DEU"}))
+        self.assertFalse(contains({"decision_date": 2010}, {"decision_date": 2012}))
+        self.assertFalse(contains({"sector": "Transport"}, {"sector": "Transport,Buildings"}))
+        self.assertFalse(contains({}, {"unknown": "x"}))
+
+
+class ResultStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        CountryHandler.calls = 0
+        self._url = local_server.serve(self, CountryHandler)
+        self._traces = []
+
+    def new_request(self, store, country="", sector=""):
+        r = request.Request(api_url=self._url)
+        r.set_result_store(store)
+        r.set_instrumentation(Instrumentation(self._traces.append))
+        if country != "":
+            r.set_country(country)
+        if sector != "":
+            r.add_sector(sector)
+        return r
+
+    def test_refinements_are_answered_locally(self):
+        store = ResultStore()
+        self.assertEqual(2, len(self.new_request(store, "IND").issue()))
+        df = self.new_request(store, "IND", "transport").issue()
+        self.assertEqual([2], list(df["policy_id"]))
+        self.assertEqual(1, CountryHandler.calls)
+        self.assertEqual([None, "reused"], [t["cache"] for t in self._traces])
+        self.assertEqual([{"api_url": self._url, "properties": {"country_iso": "IND", "sector": "transport"},
+                           "source": {"country_iso": "IND"}}], store.served)
+
+    def test_same_requests_go_to_the_server(self):
+        with tempfile.TemporaryDirectory() as directory:
+            c = ResponseCache(directory, ttl=0)
+            store = ResultStore(cache=c)
+            for _ in range(2):
+                r = self.new_request(store, "IND")
+                r.set_cache(c)
+                r.issue()
+        self.assertEqual(2, CountryHandler.calls)
+        self.assertEqual([], store.served)
+
+    def test_results_are_only_reused_for_the_same_user(self):
+        store = ResultStore()
+        r = self.new_request(store, "IND")
+        r.set_api_user("alice")
+        r.issue()
+        r = self.new_request(store, "IND", "transport")
+        r.set_api_user("bob")
+        r.issue()
+        self.assertEqual(2, CountryHandler.calls)
+        self.assertEqual([], store.served)
+
+    def test_broader_requests_go_to_the_server(self):
+        store = ResultStore()
+        self.new_request(store, "IND").issue()
+        self.assertEqual(3, len(self.new_request(store).issue()))
+        self.assertEqual(2, CountryHandler.calls)
+        self.assertEqual([], store.served)
+
+    def test_least_recently_used_results_are_dropped(self):
+        store = ResultStore(max_results=1)
+        self.new_request(store, "IND").issue()
+        self.new_request(store, "DEU").issue()
+        self.new_request(store, "IND", "Transport").issue()
+        self.assertEqual(3, CountryHandler.calls)
+
+    def test_cached_responses_are_reused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            c = ResponseCache(directory)
+            r = self.new_request(None, "IND")
+            r.set_cache(c)
+            r.issue()
+            store = ResultStore(cache=c)
+            self.assertEqual([1], list(self.new_request(store, "IND", "electricity").issue()["policy_id"]))
+        self.assertEqual(1, CountryHandler.calls)
+
+    def test_policies_matching_several_values_are_answered_once(self):
+        SectorHandler.calls = 0
+        self._url = local_server.serve(self, SectorHandler)
+        store = ResultStore()
+        broad = request.Request(api_url=self._url)
+        broad.set_result_store(store)
+        broad.add_sector(["General", "Transport"])
+        broad.issue()
+        self.assertEqual([1], list(self.new_request(store, "IND", "General").issue()["policy_id"]))
+        self.assertEqual(1, SectorHandler.calls)
+        self.assertEqual(1, len(store.served))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
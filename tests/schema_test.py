@@ -0,0 +1,59 @@
+import unittest
+
+import pandas as pd
+
+from cpdb_api import request
+from cpdb_api.schema import compact_frame
+from cpdb_api.snapshot import Snapshot
+
+
+def policies(n):
+    countries = ["IND", "DEU", "BRA", "USA"]
+    sectors = ["General", "Transport,Coal", "Electricity and heat, Buildings", ""]
+    return pd.DataFrame({
+        "policy_id": list(range(n)),
+        "policy_title": ["Policy %d" % i for i in range(n)],
+        "country_iso": [countries[i % 4] for i in range(n)],
+        "policy_status": ["In force" if i % 3 else "Planned" for i in range(n)],
+        "sector": [sectors[i % 4] for i in range(n)],
+        "decision_date": [str(2000 + i % 20) if i % 5 else "" for i in range(n)],
+    }).astype({"policy_title": object, "country_iso": object, "policy_status": object, "sector": object,
+               "decision_date": object})
+
+
+class CompactFrameTests(unittest.TestCase):
+
+    def test_column_types(self):
+        df = compact_frame(policies(100))
+        self.assertEqual("category", df["country_iso"].dtype.name)
+        self.assertEqual("category", df["policy_status"].dtype.name)
+        self.assertEqual("category", df["sector"].dtype.name)
+        self.assertEqual("Int16", df["decision_date"].dtype.name)
+        self.assertTrue(pd.isna(df["decision_date"][0]))
+        self.assertEqual(2001, df["decision_date"][1])
+        # Unique titles are left as they are.
+        self.assertEqual(object, df["policy_title"].dtype)
+
+    def test_onehot(self):
+        df = compact_frame(policies(8), multi_valued="onehot")
+        self.assertNotIn("sector", df.columns)
+        self.assertEqual([False, True, False, False], list(df["sector=Coal"][:4]))
+        self.assertEqual([False, False, True, False], list(df["sector=Buildings"][:4]))
+        self.assertIsInstance(df["sector=Coal"].dtype, pd.SparseDtype)
+
+    def test_memory_usage_shrinks(self):
+        df = policies(10000)
+        self.assertLess(compact_frame(df).memory_usage(deep=True).sum(), df.memory_usage(deep=True).sum() / 2)
+
+    def test_issue_compact(self):
+        r = request.Request()
+        r.set_snapshot(Snapshot(policies(10)))
+        self.assertEqual("category", r.issue(compact=True)["country_iso"].dtype.name)
+
+    def test_unknown_mode_raises(self):
+        with self.assertRaises(ValueError):
+            compact_frame(policies(1), multi_valued="lists")
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from cpdb_api import request
+from cpdb_api.snapshot import Snapshot
+
+# A small extract shaped like the CSV export of the database.
+_EXPORT = pd.DataFrame({
+    "Policy ID": [1, 2, 3, 4, 5],
+    "Country ISO": ["IND", "IND", "DEU", "DEU", "BRA"],
+    "Sector name": ["General", "Electricity and heat,Coal", "Transport", "General,Transport", None],
+    "Type of policy instrument": ["Direct investment", "Energy and other taxes", "Direct investment",
+                                  "Institutional creation", "Policy support"],
+    "Policy type": ["Energy efficiency", "Renewables", "Energy efficiency,Renewables", "Unknown", "Renewables"],
+    "Implementation state": ["In force", "Planned", "In force", "Ended", "In force"],
+    "Date of decision": [2010, 2012, 2010, None, 2018],
+})
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        path = os.path.join(self._dir.name, "export.csv")
+        _EXPORT.to_csv(path, index=False)
+        self._snapshot = Snapshot.from_csv(path)
+
+    def ids(self, r):
+        r.set_snapshot(self._snapshot)
+        return list(r.issue()["Policy ID"])
+
+    def test_no_filter_returns_everything(self):
+        self.assertEqual([1, 2, 3, 4, 5], self.ids(request.Request()))
+
+    def test_country_is_matched_exactly(self):
+        r = request.Request()
+        r.set_country("IND")
+        self.assertEqual([1, 2], self.ids(r))
+
+    def test_decision_date_matches_first_value_only(self):
+        r = request.Request()
+        r.set_decision_date("2010,2012")
+        self.assertEqual([1, 3], self.ids(r))
+
+    def test_multi_valued_fields_contain_any_value(self):
+        r = request.Request()
+        r.add_sector("transport")
+        r.add_sector("Coal")
+        self.assertEqual([2, 3, 4], self.ids(r))
+
+    def test_mixed_filters(self):
+        r = request.Request()
+        r.set_policy_status("In force")
+        r.add_policy_instrument("Direct investment")
+        r.add_mitigation_area("Renewables")
+        self.assertEqual([3], self.ids(r))
+
+    def test_unknown_property_raises(self):
+        with self.assertRaises(ValueError):
+            self._snapshot.query({"policy_title": "x"})
+
+    def test_saved_response_round_trip(self):
+        r = request.Request()
+        r.set_snapshot(self._snapshot)
+        r.set_country("DEU")
+        r.issue()
+        path = os.path.join(self._dir.name, "response.json")
+        r.save_json(path)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(2, len(json.load(f)))
+        self.assertEqual(2, len(Snapshot.from_json(path).query({"sector": "General,Transport"})))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,133 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from cpdb_api import request
+from cpdb_api.stream import iter_json_array
+
+_POLICIES = [
+    {"policy_id": 1, "country_iso": "DEU", "policy_title": "Energiewende für alle", "decision_date": "2010"},
+    {"policy_id": 2, "country_iso": "IND", "policy_title": "Solar, [wind] and \"grid\"", "decision_date": ""},
+    {"policy_id": 3, "country_iso": "BRA", "policy_title": "", "decision_date": "2021"},
+]
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def iter_raising(e):
+    raise e
+    yield
+
+
+class IterJsonArrayTests(unittest.TestCase):
+
+    def test_elements_split_across_chunks(self):
+        data = json.dumps(_POLICIES, ensure_ascii=False).encode("utf-8")
+        for size in (1, 2, 7, len(data)):
+            self.assertEqual(_POLICIES, list(iter_json_array(split(data, size))), "chunk size %d" % size)
+
+    def test_scalars_split_across_chunks(self):
+        self.assertEqual([12345, True, None, 1.5], list(iter_json_array(split(b"[12345, true, null, 1.5]", 2))))
+
+    def test_empty_array(self):
+        self.assertEqual([], list(iter_json_array([b" [ ", b"] "])))
+
+    def test_truncated_array_raises(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[{"policy_id": 1}, {"policy_id"']))
+
+    def test_non_array_raises(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"policy_id": 1}']))
+
+
+class RequestStreamingTests(unittest.TestCase):
+
+    def streamed_response(self):
+        resp = mock.MagicMock()
+        data = json.dumps(_POLICIES).encode("utf-8")
+        resp.iter_content.side_effect = lambda size: iter(split(data, size))
+        return resp
+
+    def test_iter_records(self):
+        with mock.patch("requests.get", return_value=self.streamed_response()) as get:
+            records = list(request.Request().iter_records(chunk_size=16))
+        self.assertTrue(get.call_args.kwargs["stream"])
+        self.assertEqual(_POLICIES, records)
+
+    def test_iter_chunks(self):
+        with mock.patch("requests.get", return_value=self.streamed_response()):
+            chunks = list(request.Request().iter_chunks(2))
+        self.assertEqual([2, 1], [len(df) for df in chunks])
+        self.assertEqual("BRA", chunks[1]["country_iso"][0])
+
+
+class IssueToFileTests(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self._data = json.dumps(_POLICIES).encode("utf-8")
+
+    def issue_to_file(self, name, **kwargs):
+        resp = mock.MagicMock()
+        resp.iter_content.side_effect = lambda size: iter(split(self._data, size))
+        path = os.path.join(self._dir.name, name)
+        with mock.patch("requests.get", return_value=resp):
+            request.Request().issue_to_file(path, chunk_size=5, **kwargs)
+        return path
+
+    def test_json_is_saved_as_sent(self):
+        with open(self.issue_to_file("cpdb.json"), "rb") as f:
+            self.assertEqual(self._data, f.read())
+
+    def test_gzipped_ndjson(self):
+        with gzip.open(self.issue_to_file("cpdb.ndjson.gz", format="ndjson", compression="gzip"), "rt") as f:
+            self.assertEqual(_POLICIES, [json.loads(line) for line in f])
+
+    def test_csv(self):
+        with open(self.issue_to_file("cpdb.csv", format="csv"), newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(["1", "Energiewende für alle"], [rows[0]["policy_id"], rows[0]["policy_title"]])
+        self.assertEqual('Solar, [wind] and "grid"', rows[1]["policy_title"])
+
+    def test_zstd(self):
+        try:
+            import zstandard
+        except ImportError:
+            self.skipTest("zstandard is not installed")
+        path = self.issue_to_file("cpdb.ndjson.zst", format="ndjson", compression="zstd")
+        with open(path, "rb") as f:
+            text = zstandard.ZstdDecompressor().stream_reader(f).read().decode("utf-8")
+        self.assertEqual(_POLICIES, [json.loads(line) for line in io.StringIO(text)])
+
+    def test_interrupted_download_leaves_the_file_untouched(self):
+        path = os.path.join(self._dir.name, "cpdb.json")
+        with open(path, "wb") as f:
+            f.write(b"[]")
+        resp = mock.MagicMock()
+        resp.iter_content.side_effect = lambda size: itertools.chain(split(self._data, size)[:2],
+                                                                     iter_raising(requests.ConnectionError()))
+        with mock.patch("requests.get", return_value=resp), self.assertRaises(requests.ConnectionError):
+            request.Request().issue_to_file(path, chunk_size=5)
+        with open(path, "rb") as f:
+            self.assertEqual(b"[]", f.read())
+        self.assertEqual(["cpdb.json"], os.listdir(self._dir.name))
+
+    def test_unknown_format_raises(self):
+        with self.assertRaises(ValueError):
+            request.Request().issue_to_file(os.path.join(self._dir.name, "cpdb.xml"), format="xml")
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
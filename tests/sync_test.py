@@ -0,0 +1,77 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import local_server
+from cpdb_api.sync import LocalStore
+
+_THIS_YEAR = str(datetime.date.today().year)
+
+
+class DatabaseHandler(local_server.Handler):
+    """Serves `policies`, filtered by decision date, and honours If-None-Match when `etag` is set."""
+
+    policies = []
+    etag = ""
+    requests = []
+
+    def do_GET(self):
+        query = self.query()
+        DatabaseHandler.requests.append(query)
+        if self.etag != "" and self.headers.get("If-None-Match") == self.etag:
+            self.reply(304)
+            return
+        year = query.get("decision_date", "")
+        records = [p for p in self.policies if year == "" or p["decision_date"] == year]
+        self.reply(body=records, headers={"ETag": self.etag} if self.etag != "" else None)
+
+
+class LocalStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        DatabaseHandler.policies = [
+            {"policy_id": 1, "policy_title": "Old", "decision_date": "2001"},
+            {"policy_id": 2, "policy_title": "Recent", "decision_date": _THIS_YEAR},
+            {"policy_id": 3, "policy_title": "Withdrawn", "decision_date": _THIS_YEAR},
+        ]
+        DatabaseHandler.etag = ""
+        DatabaseHandler.requests = []
+        url = local_server.serve(self, DatabaseHandler)
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self._store = LocalStore(os.path.join(self._dir.name, "cpdb.json"), api_url=url)
+
+    def test_first_sync_downloads_everything(self):
+        report = self._store.sync()
+        self.assertEqual([1, 2, 3], report.added)
+        self.assertEqual(3, len(self._store.load()))
+
+    def test_incremental_sync_only_fetches_recent_years(self):
+        self._store.sync()
+        DatabaseHandler.policies = [
+            {"policy_id": 1, "policy_title": "Old, edited", "decision_date": "2001"},
+            {"policy_id": 2, "policy_title": "Recent, edited", "decision_date": _THIS_YEAR},
+            {"policy_id": 4, "policy_title": "New", "decision_date": _THIS_YEAR},
+        ]
+        DatabaseHandler.requests = []
+        report = self._store.sync(window=2)
+        self.assertTrue(all("decision_date" in q for q in DatabaseHandler.requests))
+        self.assertEqual(([4], [2], [3]), (report.added, report.changed, report.removed))
+        titles = {p["policy_id"]: p["policy_title"] for p in self._store.load()}
+        self.assertEqual({1: "Old", 2: "Recent, edited", 4: "New"}, titles)
+        # A full synchronisation picks up the edit outside the window.
+        report = self._store.sync(full=True)
+        self.assertEqual(([], [1], []), (report.added, report.changed, report.removed))
+
+    def test_unchanged_database_is_revalidated(self):
+        DatabaseHandler.etag = '"v1"'
+        self._store.sync()
+        report = self._store.sync()
+        self.assertTrue(report.empty())
+        self.assertEqual(2, len(DatabaseHandler.requests))
+        self.assertEqual(3, len(self._store.load()))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)